@@ -0,0 +1,61 @@
+"""Run independent answer sources concurrently with per-source timeouts."""
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fanout")
+
+
+def _timeout_for(timeouts, name):
+    return timeouts.get(name) if isinstance(timeouts, dict) else timeouts
+
+
+def fan_out(sources, timeouts):
+    """Start every source at once and yield ``(name, result, error)`` as each settles.
+
+    ``sources`` maps a name to a zero-argument callable and ``timeouts`` is a
+    number of seconds, or a dict of them per name. A source that overruns its
+    timeout is yielded with a ``TimeoutError`` and abandoned; its worker
+    thread finishes in the background because Python threads cannot be
+    killed.
+    """
+    start = time.monotonic()
+    pending = {_executor.submit(fn): name for name, fn in sources.items()}
+    deadlines = {
+        future: start + _timeout_for(timeouts, name)
+        for future, name in pending.items()
+        if _timeout_for(timeouts, name) is not None
+    }
+    while pending:
+        remaining = [deadlines[f] - time.monotonic() for f in pending if f in deadlines]
+        done, _ = wait(pending, timeout=max(min(remaining), 0) if remaining else None,
+                       return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            try:
+                yield name, future.result(), None
+            except Exception as e:
+                yield name, None, e
+        now = time.monotonic()
+        for future in [f for f in pending if deadlines.get(f, now + 1) <= now]:
+            name = pending.pop(future)
+            future.cancel()
+            yield name, None, TimeoutError(f"{name} did not answer within {_timeout_for(timeouts, name)}s")
+
+
+async def afan_out(sources, timeouts):
+    """Async twin of :func:`fan_out` for coroutine factories.
+
+    ``sources`` maps a name to a zero-argument callable returning an
+    awaitable. Sources that overrun their timeout are cancelled.
+    """
+    async def run(name, fn):
+        try:
+            return name, await asyncio.wait_for(fn(), _timeout_for(timeouts, name)), None
+        except asyncio.TimeoutError:
+            return name, None, TimeoutError(f"{name} did not answer within {_timeout_for(timeouts, name)}s")
+        except Exception as e:
+            return name, None, e
+
+    for next_done in asyncio.as_completed([run(name, fn) for name, fn in sources.items()]):
+        yield await next_done
@@ -0,0 +1,141 @@
+"""Batched, concurrent embedding of document chunks into a vector store."""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+
+import numpy as np
+from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+
+from utils import logger
+
+# Chunks per model call; large enough to keep ONNX busy, small enough that
+# the first batch is searchable quickly
+BATCH_SIZE = int(os.environ.get("SM_EMBED_BATCH_SIZE", 64))
+# Batches embedded at once; onnxruntime releases the GIL while it runs
+WORKERS = int(os.environ.get("SM_EMBED_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+@dataclass
+class IngestStats:
+    chunks: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+
+def _batched(items, size: int):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def embed_texts(embedding, texts) -> np.ndarray:
+    """Embed ``texts`` as one float32 matrix.
+
+    FastEmbed models are called directly, skipping the conversion of every
+    vector to a Python list that ``embed_documents`` does.
+    """
+    if isinstance(embedding, FastEmbedEmbeddings):
+        model = embedding.model
+        embed = model.passage_embed if embedding.doc_embed_type == "passage" else model.embed
+        vectors = list(embed(texts, batch_size=max(len(texts), 1)))
+        return np.stack(vectors).astype(np.float32, copy=False) if vectors else np.empty((0, 0), np.float32)
+    return np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32)
+
+
+def embed_batches(chunks, embedding, batch_size: int = BATCH_SIZE, workers: int = WORKERS,
+                  stats: IngestStats | None = None):
+    """Yield ``(docs, vectors)`` per batch of ``chunks``, in input order.
+
+    Up to ``2 * workers`` batches are in flight, so ``chunks`` can be a lazy
+    stream (e.g. pages still being split) and is only read as fast as the
+    model keeps up.
+    """
+    stats = stats if stats is not None else IngestStats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+        pending = deque()
+        for batch in _batched(chunks, batch_size):
+            pending.append((batch, pool.submit(embed_texts, embedding, [d.page_content for d in batch])))
+            if len(pending) >= 2 * workers:
+                yield _collect(pending.popleft(), stats, start)
+        while pending:
+            yield _collect(pending.popleft(), stats, start)
+
+
+def _collect(item, stats: IngestStats, start: float):
+    docs, future = item
+    vectors = future.result()
+    stats.chunks += len(docs)
+    stats.batches += 1
+    stats.elapsed = time.perf_counter() - start
+    return docs, vectors
+
+
+def embed_all(chunks, embedding, **kwargs):
+    """Embed every chunk and return ``(docs, vectors)``."""
+    docs, vectors = [], []
+    for batch_docs, batch_vectors in embed_batches(chunks, embedding, **kwargs):
+        docs.extend(batch_docs)
+        vectors.append(batch_vectors)
+    return docs, np.concatenate(vectors) if vectors else np.empty((0, 0), np.float32)
+
+
+class Ingestion:
+    """Embeds a chunk stream into ``store`` on a background thread.
+
+    Each batch is added to the store as soon as it is embedded, so searches
+    see the first chunks while later ones are still being processed. When
+    everything is in, ``on_done(docs, vectors)`` is called (e.g. to persist
+    the index) and the throughput is logged.
+    """
+
+    def __init__(self, chunks, embedding, store, on_done=None, **kwargs):
+        self.store = store
+        self.stats = IngestStats()
+        self.error = None
+        self._first = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(chunks, embedding, on_done, kwargs), name="ingest", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, chunks, embedding, on_done, kwargs):
+        docs, vectors = [], []
+        try:
+            for batch_docs, batch_vectors in embed_batches(chunks, embedding, stats=self.stats, **kwargs):
+                self.store.add_embeddings(batch_docs, batch_vectors)
+                docs.extend(batch_docs)
+                vectors.append(batch_vectors)
+                self._first.set()
+            logger.info(
+                "Ingested %d chunks in %d batches in %.2fs (%.1f chunks/s)",
+                self.stats.chunks, self.stats.batches, self.stats.elapsed, self.stats.chunks_per_second,
+            )
+            if on_done is not None:
+                on_done(docs, np.concatenate(vectors) if vectors else np.empty((0, 0), np.float32))
+        except Exception as e:
+            logger.exception("Ingestion failed")
+            self.error = e
+        finally:
+            self._first.set()
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait_first(self, timeout: float | None = None) -> bool:
+        """Block until the first batch is searchable (or ingestion ended)."""
+        return self._first.wait(timeout)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
@@ -0,0 +1,195 @@
+"""Exact and semantic LLM response cache shared across chatbot pages.
+
+Every cached call is matched exactly. Only calls made inside
+``semantic_question(user_input)`` are also matched by meaning, and then
+only on that raw input: the rest of the prompt (instructions, history)
+still has to match exactly. Agent steps, tool results and memory
+summaries are therefore never answered from a different prompt.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+import numpy as np
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+CACHE_DB = Path(os.environ.get("SM_LLM_CACHE_DB", Path(__file__).resolve().parent / ".cache" / "llm_cache.db"))
+# Seconds a cached response stays valid
+TTL = 24 * 3600
+# Entries kept per namespace; the least recently used are dropped first
+MAX_ENTRIES = 5000
+# Cosine similarity above which a differently worded question counts as a hit
+SIMILARITY_THRESHOLD = 0.95
+
+
+_question: ContextVar[str | None] = ContextVar("llmcache_question", default=None)
+
+
+@contextmanager
+def semantic_question(question: str):
+    """Let LLM calls made in this block match earlier calls on ``question`` by meaning.
+
+    ``question`` must be the user's raw input as it appears in the prompt;
+    use it on free-chat pages only, where the answer depends on nothing but
+    the conversation.
+    """
+    token = _question.set(question)
+    try:
+        yield
+    finally:
+        _question.reset(token)
+
+
+def _split_prompt(prompt: str):
+    """Return ``(context, question)`` for a serialized chat prompt, or ``None``.
+
+    Chat models pass the prompt as the serialized message list. The
+    question set by ``semantic_question`` is cut out of the last message;
+    what remains is the context, which has to match exactly. ``None``
+    means the call is matched exactly only.
+    """
+    question = _question.get()
+    if not question:
+        return None
+    try:
+        messages = json.loads(prompt)
+        content = messages[-1]["kwargs"]["content"]
+    except (ValueError, LookupError, TypeError):
+        return None
+    if not isinstance(content, str) or question not in content:
+        return None
+    messages[-1]["kwargs"]["content"] = content.replace(question, "\x00")
+    return json.dumps(messages, sort_keys=True), question
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+
+class ResponseCache(BaseCache):
+    """LangChain cache backed by SQLite with exact then embedding lookups.
+
+    Each namespace (one per page) keeps its own entries, TTL and LRU
+    budget. ``stats`` counts exact hits, semantic hits and misses in this
+    process. Pass ``embedding=None`` for exact matching only.
+    """
+
+    def __init__(self, namespace: str, embedding=None, path: Path = CACHE_DB, ttl: float = TTL,
+                 max_entries: int = MAX_ENTRIES, similarity_threshold: float = SIMILARITY_THRESHOLD):
+        self.namespace = namespace
+        self.embedding = embedding
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        # question vectors computed during a missed lookup, reused by update()
+        self._vectors: dict[str, np.ndarray] = {}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, context_key TEXT NOT NULL, "
+            "value TEXT NOT NULL, vector BLOB, created REAL NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_context ON responses (namespace, context_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (namespace, last_used)")
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embedding.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _touch(self, key: str, now: float):
+        self._conn.execute(
+            "UPDATE responses SET last_used = ? WHERE namespace = ? AND key = ?", (now, self.namespace, key)
+        )
+
+    def lookup(self, prompt: str, llm_string: str):
+        split = _split_prompt(prompt) if self.embedding is not None else None
+        key = _digest(llm_string, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE namespace = ? AND key = ? AND created > ?",
+                (self.namespace, key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                self.stats["exact_hits"] += 1
+                self._touch(key, now)
+                return loads(row[0])
+            if split is None:
+                self.stats["misses"] += 1
+                return None
+
+        context, question = split
+        # embed outside the lock; it is the slow part of a lookup
+        vector = self._embed(question)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, vector FROM responses "
+                "WHERE namespace = ? AND context_key = ? AND created > ? AND vector IS NOT NULL",
+                (self.namespace, _digest(llm_string, context), now - self.ttl),
+            ).fetchall()
+            if rows:
+                scores = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    self.stats["semantic_hits"] += 1
+                    self._touch(rows[best][0], now)
+                    return loads(rows[best][1])
+            self.stats["misses"] += 1
+            if len(self._vectors) > 256:
+                self._vectors.clear()
+            self._vectors[key] = vector
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        split = _split_prompt(prompt) if self.embedding is not None else None
+        key = _digest(llm_string, prompt)
+        now = time.time()
+        with self._lock:
+            vector = self._vectors.pop(key, None)
+        if split is None:
+            # exact-only entries never take part in semantic lookups
+            context, vector = prompt, None
+        else:
+            context, question = split
+            if vector is None:
+                vector = self._embed(question)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, _digest(llm_string, context), dumps(return_val),
+                 None if vector is None else vector.tobytes(), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE namespace = ? AND (created <= ? OR key IN ("
+                "SELECT key FROM responses WHERE namespace = ? ORDER BY last_used DESC LIMIT -1 OFFSET ?))",
+                (self.namespace, now - self.ttl, self.namespace, self.max_entries),
+            )
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE namespace = ?", (self.namespace,))
+            self._vectors.clear()
+
+
+_caches: dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(namespace: str, embedding=None) -> ResponseCache:
+    """Return the process-wide cache for ``namespace``."""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = ResponseCache(namespace, embedding=embedding)
+        return _caches[namespace]
@@ -0,0 +1,103 @@
+"""Shared chat model clients, one per provider, model, endpoint and API key.
+
+Building a ``ChatOpenAI`` creates new HTTP clients, so a model built per
+rerun or per request reconnects (and repeats the TLS handshake) every
+time. ``get_chat_model`` returns the same instance for the same settings,
+and every OpenAI model talking to one endpoint shares a keep-alive
+connection pool. Nothing here depends on Streamlit.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import httpx
+
+# Connection pool per endpoint
+MAX_CONNECTIONS = int(os.environ.get("SM_LLM_MAX_CONNECTIONS", 20))
+MAX_KEEPALIVE = int(os.environ.get("SM_LLM_MAX_KEEPALIVE", 10))
+# Seconds an idle connection is kept open
+KEEPALIVE_EXPIRY = float(os.environ.get("SM_LLM_KEEPALIVE_EXPIRY", 60))
+# Seconds to connect, and to wait for a response (or the next streamed chunk)
+CONNECT_TIMEOUT = float(os.environ.get("SM_LLM_CONNECT_TIMEOUT", 10))
+TIMEOUT = float(os.environ.get("SM_LLM_TIMEOUT", 120))
+# Models kept; the least recently used are dropped first
+MAX_MODELS = 64
+
+_lock = threading.Lock()
+_models: "OrderedDict[tuple, object]" = OrderedDict()
+_http_clients: dict = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def http_clients(endpoint: str | None):
+    """Return the shared ``(httpx.Client, httpx.AsyncClient)`` for ``endpoint``.
+
+    The async client's connections belong to the event loop that first
+    uses them, which is the server's loop in the backend.
+    """
+    with _lock:
+        clients = _http_clients.get(endpoint)
+        if clients is None:
+            clients = _http_clients[endpoint] = (
+                httpx.Client(limits=_limits(), timeout=_timeout()),
+                httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+            )
+        return clients
+
+
+def _key_hash(api_key: str | None) -> str | None:
+    return hashlib.sha256(api_key.encode()).hexdigest() if api_key else None
+
+
+def _build(provider: str, model: str, api_key, base_url, cache, options: dict):
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        http_client, http_async_client = http_clients(base_url)
+        return ChatOpenAI(
+            model_name=model, api_key=api_key, base_url=base_url, cache=cache, timeout=_timeout(),
+            http_client=http_client, http_async_client=http_async_client, **options,
+        )
+    if provider == "ollama":
+        from langchain_community.chat_models import ChatOllama
+
+        # ChatOllama makes its own requests; only the instance is reused
+        return ChatOllama(model=model, base_url=base_url, cache=cache, timeout=int(TIMEOUT), **options)
+    raise ValueError(f"Unknown LLM provider {provider!r}")
+
+
+def get_chat_model(provider: str, model: str, *, api_key: str | None = None, base_url: str | None = None,
+                   cache=None, **options):
+    """Return the shared chat model for these settings, building it on first use.
+
+    ``provider`` is ``"openai"`` or ``"ollama"``; ``options`` (temperature,
+    streaming, ...) are passed to the model and are part of the key, as is
+    the response ``cache``. API keys are only kept hashed in the key.
+    """
+    key = (provider, model, base_url, _key_hash(api_key), id(cache) if cache is not None else None,
+           tuple(sorted(options.items())))
+    with _lock:
+        llm = _models.get(key)
+        if llm is not None:
+            _models.move_to_end(key)
+            return llm
+    llm = _build(provider, model, api_key, base_url, cache, options)
+    with _lock:
+        # another thread may have built the same model meanwhile; keep the first
+        llm = _models.setdefault(key, llm)
+        _models.move_to_end(key)
+        while len(_models) > MAX_MODELS:
+            _models.popitem(last=False)
+    return llm
@@ -1,22 +1,45 @@
 """FastAPI version of the original Streamlit chatbot."""
-from fastapi import FastAPI, UploadFile, File, Request
+import functools
+import importlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from fastapi import FastAPI, UploadFile, File, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sse_starlette.sse import EventSourceResponse
 from typing import List, Dict, AsyncGenerator
 
 import utils
-from streaming import StreamHandler
-from langchain.chains import ConversationChain, ConversationalRetrievalChain
-from langchain_community.utilities.sql_database import SQLDatabase
-from langchain_community.agent_toolkits import create_sql_agent
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_community.vectorstores import DocArrayInMemorySearch
-from langchain_core.documents.base import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import aiohttp
+import fanout
+from streaming import StreamHandler, SSEStreamHandler
 import asyncio
 
-app = FastAPI(title="Chat Backend", openapi_url="/openapi.json")
+# Route dependencies (LangChain chains, the SQL toolkit, PDF parsing, the
+# vector store) and the models are loaded on first use, so the server is
+# up before they are. With BACKEND_PRELOAD=1 (the default) a background
+# thread loads them right after startup. benchmarks/startup.py checks the
+# cold start.
+PRELOAD = os.environ.get("BACKEND_PRELOAD", "1") != "0"
+
+# Size of the shared pool that runs work with no native async path (SQL
+# tool calls, FastEmbed, DuckDuckGo). Also used by asyncio.to_thread and
+# LangChain's run_in_executor fallbacks, so it bounds all blocking work.
+WORKER_THREADS = int(os.environ.get("BACKEND_WORKER_THREADS", "16"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="backend")
+    asyncio.get_running_loop().set_default_executor(executor)
+    if PRELOAD:
+        threading.Thread(target=preload, name="preload", daemon=True).start()
+    yield
+    executor.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(title="Chat Backend", openapi_url="/openapi.json", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,8 +49,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-llm = utils.configure_llm()
-embed_model = utils.configure_embedding_model()
+@functools.cache
+def get_llm():
+    return utils.configure_llm()
+
+@functools.cache
+def get_embed_model():
+    return utils.configure_embedding_model()
+
+# Imported by preload(), in this order
+PRELOAD_MODULES = (
+    "langchain.chains", "langchain_community.tools", "sqlplans", "ingest", "pdfload", "vectorstore",
+)
+
+def preload():
+    """Import the route dependencies and create the models ahead of the first request."""
+    try:
+        for name in PRELOAD_MODULES:
+            importlib.import_module(name)
+        get_llm()
+        get_embed_model()
+    except Exception:
+        # the first request that needs them reports the error instead
+        utils.logger.exception("Preloading failed")
+
+SQL_DB_PATH = Path("assets/movie.db")
+SQL_DB_URI = f"sqlite:///{SQL_DB_PATH.as_posix()}?mode=ro"
+
+# Seconds each /chat/multi source may take before it is left out
+MULTI_SOURCE_TIMEOUTS = {"SQL": 90, "Web": 20}
 
 # --- Helpers ---------------------------------------------------------------
 async def stream_response(text: str) -> AsyncGenerator[str, None]:
@@ -35,58 +85,244 @@ async def stream_response(text: str) -> AsyncGenerator[str, None]:
         yield f"data: {token}\n\n"
         await asyncio.sleep(0.01)
 
+def stream_run(run, handler: SSEStreamHandler) -> EventSourceResponse:
+    """Stream ``handler``'s events while ``run`` (a coroutine returning the
+    final answer text) executes, then an ``answer`` or ``error`` event."""
+    async def drive():
+        try:
+            await handler.emit("answer", text=await run)
+        except Exception as e:
+            await handler.emit("error", message=str(e))
+        finally:
+            await handler.close()
+
+    async def events():
+        task = asyncio.create_task(drive())
+        try:
+            async for event in handler.events():
+                yield event
+        finally:
+            # client went away: stop generating
+            task.cancel()
+
+    return EventSourceResponse(events())
+
+def sql_engine():
+    import sqltools
+
+    return sqltools.sqlite_readonly_engine(SQL_DB_PATH)
+
+async def ask_sql(query: str, callbacks=None) -> dict:
+    import sqlplans
+
+    # The sample DB is opened read-only, so query results are cached along
+    # with the SQL; repeat questions skip the agent and only phrase the answer
+    return await sqlplans.aask(
+        query, SQL_DB_URI, sql_engine, llm=get_llm(), callbacks=callbacks, cache_results=True,
+    )
+
+def sql_results():
+    """``sqlresults``, able to open the sample DB for result ids registered by any worker."""
+    import sqlresults
+
+    sqlresults.add_source(SQL_DB_URI, sql_engine)
+    return sqlresults
+
+def sql_message(result: dict) -> dict:
+    # result_id pages through the rows of the final query at /sql/results/<id>
+    return {"role": "assistant", "text": result["output"], "sql": result["sql"], "result_id": result["result_id"]}
+
+async def advisory_chain(content: bytes, filename: str = "upload"):
+    import ingest
+    import pdfload
+    from langchain.chains import ConversationalRetrievalChain
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_core.documents.base import Document
+    from vectorstore import NumpyVectorStore
+
+    # PDFs are parsed in memory, page-parallel; anything else is taken as text
+    if content.startswith(b"%PDF"):
+        pages = pdfload.load_pdf(filename, content)
+    else:
+        pages = [Document(page_content=content.decode("utf-8", errors="ignore"), metadata={"source": filename})]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    # consumed on the worker thread: pages are split and embedded as they are extracted
+    chunks = (chunk for page in pages for chunk in splitter.split_documents([page]))
+    embed_model = await asyncio.to_thread(get_embed_model)
+    docs, vectors = await asyncio.to_thread(ingest.embed_all, chunks, embed_model)
+    vectordb = NumpyVectorStore.from_embeddings(docs, vectors, embed_model)
+    retriever = vectordb.as_retriever()
+    return ConversationalRetrievalChain.from_llm(llm=get_llm(), retriever=retriever)
+
+def multi_sources(query: str, callbacks=lambda name: []):
+    """Independent /chat/multi sources, each a coroutine factory."""
+    from langchain_community.tools import DuckDuckGoSearchRun
+
+    async def run_sql():
+        return (await ask_sql(query, callbacks("SQL")))["output"]
+
+    return {
+        "Web": lambda: DuckDuckGoSearchRun().arun(query, callbacks=callbacks("Web")),
+        "SQL": run_sql,
+    }
+
+def combine_answers(answers: Dict[str, str]) -> str:
+    return "\n".join(f"{name}: {answers[name]}" for name in ("SQL", "Web") if name in answers)
+
 # --- Routes ----------------------------------------------------------------
+# Each /chat/<page> route has a /chat/<page>/stream twin that sends SSE
+# events as they happen: "token" (LLM output), "tool_start"/"tool_end" and
+# "sql" (agent steps), then one "answer" or "error". Data is always JSON.
+
 @app.post("/chat/basic")
 # Ported from ConversationChain logic in Streamlit app
 async def chat_basic(data: Dict[str, str]):
-    chain = ConversationChain(llm=llm, verbose=False)
+    import llmcache
+    from langchain.chains import ConversationChain
+
+    chain = ConversationChain(llm=get_llm(), verbose=False)
     prompt = data.get("message", "")
-    result = chain.invoke({"input": prompt})
+    with llmcache.semantic_question(prompt):
+        result = await chain.ainvoke({"input": prompt})
     return {"messages": [{"role": "assistant", "text": result["response"]}]}
 
+@app.post("/chat/basic/stream")
+async def chat_basic_stream(data: Dict[str, str]):
+    import llmcache
+    from langchain.chains import ConversationChain
+
+    chain = ConversationChain(llm=get_llm(), verbose=False)
+    handler = SSEStreamHandler()
+
+    async def run():
+        prompt = data.get("message", "")
+        with llmcache.semantic_question(prompt):
+            result = await chain.ainvoke({"input": prompt}, {"callbacks": [handler]})
+        return result["response"]
+
+    return stream_run(run(), handler)
+
 @app.post("/chat/sql")
 # Ported from SqlChatbot class
 async def chat_sql(data: Dict[str, str]):
-    db = SQLDatabase.from_uri("sqlite:///assets/movie.db")
-    agent = create_sql_agent(llm=llm, db=db)
     query = data.get("message", "")
-    result = agent.invoke({"input": query})
-    return {"messages": [{"role": "assistant", "text": result["output"]}]}
+    return {"messages": [sql_message(await ask_sql(query))]}
+
+@app.post("/chat/sql/stream")
+async def chat_sql_stream(data: Dict[str, str]):
+    handler = SSEStreamHandler()
+
+    async def run():
+        result = await ask_sql(data.get("message", ""), [handler])
+        if result["result_id"]:
+            await handler.emit("result", sql=result["sql"], result_id=result["result_id"])
+        return result["output"]
+
+    return stream_run(run(), handler)
+
+# Full results of the SQL agent's final query, by the result_id of a
+# /chat/sql answer: one page as JSON, or every row as SSE "columns", "rows"
+# (one event per cursor batch) and "end" events
+@app.get("/sql/results/{result_id}")
+async def sql_result_page(result_id: str, offset: int = 0, limit: int | None = None):
+    import sqlguard
+
+    sqlresults = sql_results()
+    try:
+        page = await asyncio.to_thread(sqlresults.page, result_id, offset, limit or sqlresults.PAGE_SIZE)
+    except sqlguard.QueryRejected as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result id")
+    return page
+
+@app.get("/sql/results/{result_id}/stream")
+async def sql_result_stream(result_id: str):
+    sqlresults = sql_results()
+    entry = await asyncio.to_thread(sqlresults.lookup, result_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result id")
+
+    async def events():
+        rows = sqlresults.read(entry)
+        total = 0
+        try:
+            columns = await asyncio.to_thread(next, rows)
+            yield {"event": "columns", "data": json.dumps(columns)}
+            while (batch := await asyncio.to_thread(next, rows, None)) is not None:
+                total += len(batch)
+                yield {"event": "rows", "data": json.dumps([[sqlresults.json_cell(v) for v in row] for row in batch])}
+            yield {"event": "end", "data": json.dumps({"rows": total})}
+        except Exception as e:
+            yield {"event": "error", "data": json.dumps({"message": str(e)})}
+        finally:
+            # client went away: release the cursor
+            await asyncio.to_thread(rows.close)
+
+    return EventSourceResponse(events())
 
 @app.post("/chat/web")
 # Ported from InternetChatbot
 async def chat_web(data: Dict[str, str]):
+    from langchain_community.tools import DuckDuckGoSearchRun
+
     tool = DuckDuckGoSearchRun()
     query = data.get("message", "")
-    result = tool.run(query)
+    result = await tool.arun(query)
     return {"messages": [{"role": "assistant", "text": result}]}
 
 @app.post("/chat/advisory")
 # Ported from CustomDocChatbot
 async def chat_advisory(file: UploadFile = File(...), request: Request = None):
-    content = await file.read()
-    doc = Document(page_content=content.decode("utf-8", errors="ignore"))
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_documents([doc])
-    vectordb = DocArrayInMemorySearch.from_documents(chunks, embed_model)
-    retriever = vectordb.as_retriever()
-    chain = ConversationalRetrievalChain.from_llm(llm=llm, retriever=retriever)
+    chain = await advisory_chain(await file.read(), file.filename)
     data = await request.form()
     message = data.get("message", "")
-    result = chain.invoke({"question": message})
+    result = await chain.ainvoke({"question": message})
     return {"messages": [{"role": "assistant", "text": result["answer"]}]}
 
+@app.post("/chat/advisory/stream")
+async def chat_advisory_stream(file: UploadFile = File(...), request: Request = None):
+    # read the upload now; FastAPI closes it once this handler returns
+    content, filename = await file.read(), file.filename
+    data = await request.form()
+    handler = SSEStreamHandler()
+
+    async def run():
+        chain = await advisory_chain(content, filename)
+        result = await chain.ainvoke({"question": data.get("message", "")}, {"callbacks": [handler]})
+        return result["answer"]
+
+    return stream_run(run(), handler)
+
 @app.post("/chat/multi")
 # Ported from MultiSourceChatbot
 async def chat_multi(data: Dict[str, str]):
-    query = data.get("message", "")
-    # Combine SQL, web search, and document retrieval
-    web = DuckDuckGoSearchRun().run(query)
-    db = SQLDatabase.from_uri("sqlite:///assets/movie.db")
-    agent = create_sql_agent(llm=llm, db=db)
-    sql_ans = agent.invoke({"input": query})["output"]
-    combined = f"SQL: {sql_ans}\nWeb: {web}"
-    return {"messages": [{"role": "assistant", "text": combined}]}
+    # Combine SQL and web search, run side by side; a source that fails or
+    # overruns its timeout is left out instead of failing the request
+    answers = {}
+    async for name, answer, error in fanout.afan_out(multi_sources(data.get("message", "")), MULTI_SOURCE_TIMEOUTS):
+        if error is None:
+            answers[name] = answer
+    return {"messages": [{"role": "assistant", "text": combine_answers(answers)}]}
+
+@app.post("/chat/multi/stream")
+async def chat_multi_stream(data: Dict[str, str]):
+    # all sources share one queue; every event carries its "source"
+    handler = SSEStreamHandler()
+    handlers = {name: SSEStreamHandler(queue=handler.queue, source=name) for name in MULTI_SOURCE_TIMEOUTS}
+
+    async def run():
+        sources = multi_sources(data.get("message", ""), lambda name: [handlers[name]])
+        answers = {}
+        async for name, answer, error in fanout.afan_out(sources, MULTI_SOURCE_TIMEOUTS):
+            if error is None:
+                answers[name] = answer
+                await handlers[name].emit("source_answer", text=answer)
+            else:
+                await handlers[name].emit("source_error", message=str(error))
+        return combine_answers(answers)
+
+    return stream_run(run(), handler)
 
 @app.post("/stream")
 # Example streaming endpoint
@@ -94,4 +330,3 @@ async def stream_demo(data: Dict[str, str]):
     text = data.get("message", "")
     generator = stream_response(text)
     return EventSourceResponse(generator)
-
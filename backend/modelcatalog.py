@@ -0,0 +1,106 @@
+"""OpenAI model catalog per API key, cached for every session in the process."""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from utils import logger
+
+# Seconds a fetched catalog is served before it is refreshed in the background
+TTL = float(os.environ.get("SM_MODEL_CATALOG_TTL", 3600))
+# Seconds a rejected key is remembered as invalid
+INVALID_TTL = 300
+# Keys remembered; the least recently used are dropped first
+MAX_KEYS = 256
+
+
+class InvalidKey(Exception):
+    """The provider rejected the API key."""
+
+
+@dataclass
+class _Entry:
+    models: list | None
+    error: str | None
+    fetched: float
+    refreshing: bool = False
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+
+def key_hash(api_key: str) -> str:
+    """Cache key for ``api_key``; the key itself is never stored."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _fetch(api_key: str) -> list[str]:
+    import openai
+
+    client = openai.OpenAI(api_key=api_key)
+    models = sorted((m for m in client.models.list() if str(m.id).startswith("gpt")), key=lambda m: m.created)
+    return [m.id for m in models]
+
+
+def _load(api_key: str) -> _Entry:
+    """Fetch the catalog; a rejected key becomes an entry with ``error`` set."""
+    import openai
+
+    try:
+        return _Entry(_fetch(api_key), None, time.monotonic())
+    except openai.AuthenticationError as e:
+        message = e.body.get("message") if isinstance(e.body, dict) else None
+        return _Entry(None, message or str(e), time.monotonic())
+
+
+def _store(digest: str, entry: _Entry):
+    with _lock:
+        _entries[digest] = entry
+        _entries.move_to_end(digest)
+        while len(_entries) > MAX_KEYS:
+            _entries.popitem(last=False)
+
+
+def _refresh(api_key: str, digest: str):
+    try:
+        _store(digest, _load(api_key))
+    except Exception as e:
+        # keep serving the stale catalog; the next expiry tries again
+        logger.warning(f"Refreshing the model catalog failed: {e}")
+        with _lock:
+            entry = _entries.get(digest)
+            if entry is not None:
+                entry.refreshing = False
+                entry.fetched = time.monotonic()
+
+
+def get_models(api_key: str) -> list[str]:
+    """Return the ``gpt`` models ``api_key`` can use, oldest first.
+
+    Only the first call for a key waits for the provider. After ``TTL``
+    the cached list is still returned while a background thread fetches a
+    new one. Raises ``InvalidKey`` for a rejected key (remembered for
+    ``INVALID_TTL``); network errors on a first fetch propagate.
+    """
+    digest = key_hash(api_key)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(digest)
+        if entry is not None:
+            _entries.move_to_end(digest)
+            if entry.error is not None and now - entry.fetched > INVALID_TTL:
+                entry = None
+            elif entry.models is not None and now - entry.fetched > TTL and not entry.refreshing:
+                entry.refreshing = True
+                threading.Thread(
+                    target=_refresh, args=(api_key, digest), name="model-catalog", daemon=True
+                ).start()
+    if entry is None:
+        entry = _load(api_key)
+        _store(digest, entry)
+    if entry.error is not None:
+        raise InvalidKey(entry.error)
+    return entry.models
@@ -0,0 +1,233 @@
+"""Cache of the SQL the agent wrote for a question, replayed without the agent loop."""
+import asyncio
+import functools
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+import sqlguard
+import sqlresults
+import sqltools
+
+PLAN_DB = Path(os.environ.get("SM_SQL_PLAN_DB", Path(__file__).resolve().parent / ".cache" / "sql_plans.db"))
+# Seconds a stored query (and its cached result) stays valid
+TTL = 7 * 24 * 3600
+# Plans kept in total; the least recently used are dropped first
+MAX_ENTRIES = 2000
+
+ANSWER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You answer questions about a SQL database. A query has already been run for the question; "
+     "answer from its result only, concisely. If the result is empty, say that nothing matched."),
+    ("human", "Question: {question}\n\nSQL query:\n{sql}\n\nResult:\n{result}"),
+])
+
+
+def normalize_question(question: str) -> str:
+    """Case, punctuation and spacing insensitive form of ``question``."""
+    question = unicodedata.normalize("NFKC", question).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", question).split())
+
+
+class PlanCache:
+    """SQLite store of ``(database, schema fingerprint, question) -> SQL``.
+
+    A lookup with a fingerprint the database no longer has drops every
+    plan stored under the old one. Results are only kept when asked to,
+    which is only safe for databases nobody writes to. Databases are
+    stored by ``sqlresults.source_key``, never by their URI.
+    """
+
+    def __init__(self, path: Path = PLAN_DB, ttl: float = TTL, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0}
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "source TEXT NOT NULL, fingerprint TEXT NOT NULL, question TEXT NOT NULL, "
+            "sql TEXT NOT NULL, result TEXT, created REAL NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (source, question))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS plans_lru ON plans (last_used)")
+
+    def lookup(self, uri: str, fingerprint: str, question: str):
+        """Return ``{"sql": ..., "result": ... or None}`` or ``None``."""
+        source = sqlresults.source_key(uri)
+        now = time.time()
+        with self._lock:
+            stale = self._conn.execute(
+                "DELETE FROM plans WHERE source = ? AND fingerprint != ?", (source, fingerprint)
+            ).rowcount
+            self.stats["invalidated"] += stale
+            row = self._conn.execute(
+                "SELECT sql, result FROM plans WHERE source = ? AND question = ? AND created > ?",
+                (source, normalize_question(question), now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._conn.execute(
+                "UPDATE plans SET last_used = ? WHERE source = ? AND question = ?",
+                (now, source, normalize_question(question)),
+            )
+            return {"sql": row[0], "result": row[1]}
+
+    def store(self, uri: str, fingerprint: str, question: str, sql: str, result: str | None = None):
+        source = sqlresults.source_key(uri)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, fingerprint, normalize_question(question), sql, result, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM plans WHERE created <= ? OR rowid IN ("
+                "SELECT rowid FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (now - self.ttl, self.max_entries),
+            )
+
+    def discard(self, uri: str, question: str):
+        source = sqlresults.source_key(uri)
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM plans WHERE source = ? AND question = ?", (source, normalize_question(question))
+            )
+
+
+class SQLCapture(BaseCallbackHandler):
+    """Records the last ``sql_db_query`` call that succeeded, and its output."""
+
+    def __init__(self):
+        self.sql = None
+        self.result = None
+        self._pending = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, inputs=None, **kwargs):
+        if (serialized or {}).get("name") == "sql_db_query":
+            self._pending[run_id] = inputs.get("query", input_str) if isinstance(inputs, dict) else input_str
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        sql = self._pending.pop(run_id, None)
+        # the tool reports SQL errors as its output rather than raising
+        if sql is not None and not str(output).startswith("Error"):
+            self.sql, self.result = sql, str(output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._pending.pop(run_id, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PlanCache()
+        return _cache
+
+
+def _phrase(llm):
+    return ANSWER_PROMPT | llm | StrOutputParser()
+
+
+def _answer(output: str, uri: str, engine_factory, sql: str | None, plan_hit: bool) -> dict:
+    # the result id lets the caller page through every row of the final query
+    return {
+        "output": output,
+        "sql": sql,
+        "result_id": sqlresults.register(uri, sql, engine_factory) if sql else None,
+        "plan_hit": plan_hit,
+    }
+
+
+def ask(question: str, uri: str, engine_factory=None, *, llm, callbacks=None,
+        cache_results: bool = False, **agent_kwargs) -> dict:
+    """Answer ``question`` from a stored plan, or with the SQL agent.
+
+    On a hit the stored SQL is run (or its result reused when
+    ``cache_results``) and the LLM is only asked to phrase the answer.
+    Replayed SQL is checked like the agent's own queries; a plan that is
+    refused or fails is dropped and the agent answers instead.
+    Returns ``{"output", "sql", "result_id", "plan_hit"}``.
+    """
+    callbacks = list(callbacks or [])
+    cache = get_plan_cache()
+    digest = sqltools.get_schema_digest(uri, engine_factory)
+    fingerprint = digest.fingerprint
+    plan = cache.lookup(uri, fingerprint, question)
+    if plan is not None:
+        result = plan["result"]
+        try:
+            db = sqltools.get_database(uri, engine_factory)
+            if result is None:
+                # replayed SQL passes the same plan check as the agent's queries
+                result = sqlresults.summarize(
+                    db, plan["sql"], guard=True, row_counts=digest.tables, timeout=sqlguard.STATEMENT_TIMEOUT
+                )
+                if cache_results:
+                    cache.store(uri, fingerprint, question, plan["sql"], result)
+        except Exception:
+            cache.discard(uri, question)
+        else:
+            output = _phrase(llm).invoke(
+                {"question": question, "sql": plan["sql"], "result": result}, {"callbacks": callbacks}
+            )
+            return _answer(output, uri, engine_factory, plan["sql"], plan_hit=True)
+
+    capture = SQLCapture()
+    agent = sqltools.get_sql_agent(uri, engine_factory, llm=llm, **agent_kwargs)
+    result = agent.invoke({"input": question}, {"callbacks": callbacks + [capture]})
+    if capture.sql:
+        cache.store(uri, fingerprint, question, capture.sql, capture.result if cache_results else None)
+    return _answer(result["output"], uri, engine_factory, capture.sql, plan_hit=False)
+
+
+async def aask(question: str, uri: str, engine_factory=None, *, llm, callbacks=None,
+               cache_results: bool = False, **agent_kwargs) -> dict:
+    """Async ``ask``; database work runs on worker threads."""
+    callbacks = list(callbacks or [])
+    cache = get_plan_cache()
+    digest = await asyncio.to_thread(sqltools.get_schema_digest, uri, engine_factory)
+    plan = await asyncio.to_thread(cache.lookup, uri, digest.fingerprint, question)
+    if plan is not None:
+        result = plan["result"]
+        try:
+            db = await asyncio.to_thread(sqltools.get_database, uri, engine_factory)
+            if result is None:
+                result = await asyncio.to_thread(
+                    functools.partial(sqlresults.summarize, db, plan["sql"], guard=True, row_counts=digest.tables,
+                                      timeout=sqlguard.STATEMENT_TIMEOUT)
+                )
+                if cache_results:
+                    await asyncio.to_thread(cache.store, uri, digest.fingerprint, question, plan["sql"], result)
+        except Exception:
+            await asyncio.to_thread(cache.discard, uri, question)
+        else:
+            output = await _phrase(llm).ainvoke(
+                {"question": question, "sql": plan["sql"], "result": result}, {"callbacks": callbacks}
+            )
+            return await asyncio.to_thread(_answer, output, uri, engine_factory, plan["sql"], True)
+
+    capture = SQLCapture()
+    agent = await asyncio.to_thread(sqltools.get_sql_agent, uri, engine_factory, llm=llm, **agent_kwargs)
+    result = await agent.ainvoke({"input": question}, {"callbacks": callbacks + [capture]})
+    if capture.sql:
+        await asyncio.to_thread(
+            cache.store, uri, digest.fingerprint, question, capture.sql, capture.result if cache_results else None
+        )
+    return await asyncio.to_thread(_answer, result["output"], uri, engine_factory, capture.sql, False)
@@ -0,0 +1,351 @@
+"""Bounded SQL results: compact previews for the LLM, paged access for users."""
+import datetime
+import decimal
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import text
+from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
+
+import sqlguard
+
+# Rows shown to the LLM
+PREVIEW_ROWS = 20
+# LIMIT the agent is told to stay under; the LLM only sees the preview, the
+# user can page through all of them
+AGENT_TOP_K = 1000
+# Rows read per round trip from the server-side cursor
+FETCH_BATCH = 500
+# Rows scanned for the row count and aggregates; the rest is left unread
+MAX_SCAN_ROWS = sqlguard.MAX_ROWS
+# Longest cell value shown in a preview
+MAX_CELL_CHARS = 80
+# Distinct values tracked per text column before counting stops
+MAX_DISTINCT = 1000
+# Default and largest page served by ``page()``
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Queries remembered for paging, by result id. They are kept on disk so
+# that any server worker can page a result another one produced.
+RESULTS_DB = Path(os.environ.get("SM_SQL_RESULTS_DB", Path(__file__).resolve().parent / ".cache" / "sql_results.db"))
+# Seconds a result id stays valid, and how many are kept (oldest dropped first)
+RESULT_TTL = 24 * 3600
+MAX_RESULTS = 10_000
+
+_lock = threading.Lock()
+_conn = None
+# source key -> (uri, engine_factory) of the databases this process can open
+_sources: dict[str, tuple] = {}
+
+
+def _type_name(value) -> str:
+    if isinstance(value, bool):
+        return "BOOLEAN"
+    if isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, (float, decimal.Decimal)):
+        return "REAL"
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return "DATETIME"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "BLOB"
+    return "TEXT"
+
+
+def _cell(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    value = str(value)
+    return value if len(value) <= MAX_CELL_CHARS else value[:MAX_CELL_CHARS] + "…"
+
+
+def json_cell(value):
+    """Row values as JSON-safe scalars for the API."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    return str(value)
+
+
+class _Column:
+    """Running aggregates for one result column."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.type = None
+        self.count = self.nulls = 0
+        self.min = self.max = None
+        self.total = 0.0
+        self.values = Counter()
+        self.distinct_capped = False
+
+    def add(self, value):
+        if value is None:
+            self.nulls += 1
+            return
+        self.count += 1
+        self.type = self.type or _type_name(value)
+        if self.type in ("INTEGER", "REAL") and isinstance(value, (int, float, decimal.Decimal)):
+            self.total += float(value)
+        try:
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+        except TypeError:
+            pass
+        if self.type == "TEXT":
+            if value in self.values or len(self.values) < MAX_DISTINCT:
+                self.values[value] += 1
+            else:
+                self.distinct_capped = True
+
+    def describe(self) -> str:
+        parts = [f"{self.count} non-null"]
+        if self.nulls:
+            parts.append(f"{self.nulls} null")
+        if self.type in ("INTEGER", "REAL") and self.count:
+            parts.append(f"min {_cell(self.min)}, max {_cell(self.max)}, "
+                         f"sum {self.total:.6g}, mean {self.total / self.count:.6g}")
+        elif self.type == "DATETIME" and self.count:
+            parts.append(f"from {_cell(self.min)} to {_cell(self.max)}")
+        elif self.type == "TEXT" and self.count:
+            distinct = f"{'>' if self.distinct_capped else ''}{len(self.values)} distinct"
+            top = ", ".join(f"{_cell(v)!r} ×{n}" for v, n in self.values.most_common(3) if n > 1)
+            parts.append(distinct + (f", most common: {top}" if top else ""))
+        return f"{self.name} ({self.type or 'NULL'}): " + "; ".join(parts)
+
+
+def _sql(query: str) -> str:
+    return query.strip().rstrip(";").strip()
+
+
+def source_key(uri: str) -> str:
+    """Stands in for a connection URI in anything stored; URIs can carry passwords."""
+    return hashlib.sha256(uri.encode()).hexdigest()
+
+
+def add_source(uri: str, engine_factory=None) -> str:
+    """Let this process open result ids registered for ``uri`` by any process; returns its key.
+
+    ``uri`` and ``engine_factory`` are what ``sqltools.get_database`` takes.
+    """
+    key = source_key(uri)
+    with _lock:
+        _sources[key] = (uri, engine_factory)
+    return key
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        RESULTS_DB.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(RESULTS_DB, timeout=30, isolation_level=None, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "id TEXT PRIMARY KEY, source TEXT NOT NULL, sql TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+    return _conn
+
+
+def register(uri: str, query: str, engine_factory=None) -> str:
+    """Remember ``query`` on ``uri`` so its result can be paged; returns its result id."""
+    source = add_source(uri, engine_factory)
+    query = _sql(query)
+    rid = hashlib.sha256(f"{source}\x00{query}".encode()).hexdigest()[:32]
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (rid, source, query, now))
+        conn.execute(
+            "DELETE FROM results WHERE created <= ? OR rowid IN ("
+            "SELECT rowid FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (now - RESULT_TTL, MAX_RESULTS),
+        )
+    return rid
+
+
+def lookup(rid: str):
+    """Return ``(db, query, row_counts)`` for a registered result id, or ``None``.
+
+    ``None`` also when the id's database was never added to this process
+    (see ``add_source``). ``row_counts`` sizes the tables for the guard;
+    pass the entry to ``read``.
+    """
+    with _lock:
+        row = _connect().execute(
+            "SELECT source, sql FROM results WHERE id = ? AND created > ?", (rid, time.time() - RESULT_TTL)
+        ).fetchone()
+        source = _sources.get(row[0]) if row is not None else None
+    if source is None:
+        return None
+    # sqltools imports this module
+    import sqltools
+
+    return sqltools.get_database(*source), row[1], sqltools.get_schema_digest(*source).tables
+
+
+def read(entry, query: str | None = None, batch: int = FETCH_BATCH):
+    """``iter_rows`` for a ``lookup`` entry (or ``query`` on its database), guarded and under the timeout.
+
+    Paging and streaming run the agent's SQL again on every request, so
+    they get the same plan check and statement timeout as the agent.
+    """
+    db, stored, row_counts = entry
+    return iter_rows(db, query or stored, batch, guard=True, row_counts=row_counts,
+                     timeout=sqlguard.STATEMENT_TIMEOUT)
+
+
+def iter_rows(db, query: str, batch: int = FETCH_BATCH, *, guard: bool = False, row_counts: dict | None = None,
+              timeout: float | None = None, max_rows: int = sqlguard.MAX_ROWS):
+    """Yield the column names, then lists of rows, through a server-side cursor.
+
+    At most ``max_rows`` rows are read. With ``guard`` the plan is checked
+    first (``row_counts`` sizes the tables for SQLite), and ``timeout``
+    bounds how long the statement may run; both raise
+    ``sqlguard.QueryRejected``.
+    """
+    with db._engine.connect() as conn:
+        if guard:
+            sqlguard.check(conn, _sql(query), row_counts)
+        with sqlguard.statement_timeout(conn, timeout):
+            result = conn.execution_options(yield_per=batch).execute(text(_sql(query)))
+            if not result.returns_rows:
+                yield []
+                return
+            yield list(result.keys())
+            for partition in result.partitions(batch):
+                rows = [tuple(row) for row in partition[:max_rows]]
+                max_rows -= len(rows)
+                yield rows
+                if max_rows <= 0:
+                    break
+
+
+def summarize(db, query: str, *, guard: bool = False, row_counts: dict | None = None,
+              timeout: float | None = None) -> str:
+    """Run ``query`` and describe its result for the LLM.
+
+    Only the first ``PREVIEW_ROWS`` rows are shown, followed by per-column
+    aggregates over up to ``MAX_SCAN_ROWS`` rows. The full result is not
+    held in memory; it is read batch by batch from the cursor. ``guard``,
+    ``row_counts`` and ``timeout`` are passed to ``iter_rows``.
+    """
+    rows = iter_rows(db, query, guard=guard, row_counts=row_counts, timeout=timeout, max_rows=MAX_SCAN_ROWS)
+    names = next(rows)
+    columns = [_Column(name) for name in names]
+    preview, scanned, truncated = [], 0, False
+    for batch in rows:
+        for row in batch:
+            if len(preview) < PREVIEW_ROWS:
+                preview.append(row)
+            for column, value in zip(columns, row):
+                column.add(value)
+        scanned += len(batch)
+        if scanned >= MAX_SCAN_ROWS:
+            truncated = True
+            break
+    rows.close()
+
+    if not names:
+        return "The statement returned no rows."
+    header = ", ".join(f"{c.name} {c.type or 'NULL'}" for c in columns)
+    count = f"at least {scanned}" if truncated else str(scanned)
+    lines = [f"Columns: {header}",
+             f"Rows: {count}" + (f" (first {len(preview)} shown)" if scanned > len(preview) else "")]
+    if preview:
+        lines.append(" | ".join(names))
+        lines.extend(" | ".join(_cell(v) for v in row) for row in preview)
+    if scanned > len(preview):
+        lines.append("Aggregates" + (f" over the first {scanned} rows" if truncated else "") + ":")
+        lines.extend(c.describe() for c in columns)
+    if scanned > len(preview):
+        lines.append("The user is shown every row in a table; summarize rather than list them.")
+    return "\n".join(lines)
+
+
+def page(rid: str, offset: int = 0, limit: int = PAGE_SIZE):
+    """Return one page of a registered result as a JSON-ready dict, or ``None``.
+
+    Raises ``sqlguard.QueryRejected`` when the query is refused or times out.
+    """
+    entry = lookup(rid)
+    if entry is None:
+        return None
+    query = entry[1]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    # one row past the page tells whether there is a next one
+    wrapped = f"SELECT * FROM ({query}) AS page LIMIT {limit + 1} OFFSET {offset}"
+    try:
+        rows = read(entry, wrapped)
+        names = next(rows)
+        data = [row for batch in rows for row in batch]
+    except sqlguard.QueryRejected:
+        raise
+    except Exception:
+        # dialects without LIMIT/OFFSET: skip through the cursor instead
+        rows = read(entry)
+        names, data, seen = next(rows), [], 0
+        for batch in rows:
+            for row in batch:
+                if seen >= offset:
+                    data.append(row)
+                seen += 1
+            if len(data) > limit:
+                break
+        rows.close()
+    return {
+        "result_id": rid,
+        "columns": names,
+        "rows": [[json_cell(v) for v in row] for row in data[:limit]],
+        "offset": offset,
+        "limit": limit,
+        "has_more": len(data) > limit,
+    }
+
+
+class BoundedQueryTool(QuerySQLDatabaseTool):
+    """``sql_db_query`` that answers with a preview and aggregates, not a row dump.
+
+    Queries go through ``sqlguard``: expensive plans are refused and slow
+    statements stopped, and the agent is told why so it can rewrite them.
+    """
+
+    row_counts: dict = {}
+    timeout: float | None = sqlguard.STATEMENT_TIMEOUT
+
+    def _run(self, query: str, run_manager=None) -> str:
+        try:
+            return summarize(self.db, query, guard=True, row_counts=self.row_counts, timeout=self.timeout)
+        except Exception as e:
+            # same shape as SQLDatabase.run_no_throw so the agent can retry;
+            # a QueryRejected message tells it what to change
+            return f"Error: {e}"
+
+
+class BoundedSQLToolkit(SQLDatabaseToolkit):
+    """The standard SQL toolkit with the query tool swapped for ``BoundedQueryTool``."""
+
+    # table -> row count, for sizing SQLite plans
+    row_counts: dict = {}
+
+    def get_tools(self):
+        return [
+            BoundedQueryTool(db=self.db, description=tool.description, row_counts=self.row_counts)
+            if isinstance(tool, QuerySQLDatabaseTool) else tool
+            for tool in super().get_tools()
+        ]
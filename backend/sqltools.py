@@ -0,0 +1,345 @@
+"""Process-wide registry of SQL databases and agents keyed by connection URI."""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from sqlalchemy import create_engine, func, inspect, select, text
+from sqlalchemy import column as sql_column, table as sql_table
+from langchain_community.utilities.sql_database import SQLDatabase
+from langchain_community.agent_toolkits import create_sql_agent
+from langchain_community.agent_toolkits.sql.prompt import SQL_PREFIX
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import (
+    ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder, PromptTemplate,
+    SystemMessagePromptTemplate,
+)
+
+import sqlresults
+
+# Most databases kept open at once; the least recently used one is closed first
+MAX_DATABASES = 8
+# Agents kept per database (one per distinct LLM client)
+MAX_AGENTS_PER_DATABASE = 4
+# Seconds a database may sit unused before its engine is disposed
+IDLE_TIMEOUT = 30 * 60
+# Seconds between liveness probes of a cached engine
+HEALTH_CHECK_INTERVAL = 60
+# Text columns with at most this many distinct values have them listed in the digest
+SAMPLE_MAX_DISTINCT = 25
+# Longest sampled value kept in the digest
+SAMPLE_MAX_CHARS = 40
+# Tables with more rows than this are not scanned for value samples
+SAMPLE_MAX_ROWS = 200_000
+
+# Replace the toolkit's "look at the tables first" openings, since the
+# schema is already in the system prompt: one for function/tool-calling
+# agents, one for the default ReAct agent
+SCHEMA_SUFFIX = "I have the schema of the database above, so I can write the query directly."
+SCHEMA_REACT_SUFFIX = "Begin!\n\nQuestion: {input}\nThought: " + SCHEMA_SUFFIX + "\n{agent_scratchpad}"
+FUNCTION_AGENT_TYPES = ("openai-tools", "tool-calling", "openai-functions")
+
+# Guards the two registries below only; each database has its own lock for
+# connecting, probing, reflecting and building agents
+_lock = threading.Lock()
+_databases: "OrderedDict[str, _Entry]" = OrderedDict()
+# Digests by schema fingerprint, shared by every URI that points at the same schema
+_digests: "OrderedDict[str, SchemaDigest]" = OrderedDict()
+
+
+@dataclass
+class SchemaDigest:
+    """Compact description of a database's schema for the agent prompt."""
+    fingerprint: str
+    text: str
+    # table name -> row count (None when it could not be counted)
+    tables: dict = field(default_factory=dict)
+
+
+def _reflect(db: SQLDatabase) -> dict:
+    """Columns, primary and foreign keys of every usable table, as plain data."""
+    inspector = inspect(db._engine)
+    # from the live database: SQLDatabase's own table list is fixed at creation
+    names = set(inspector.get_table_names(schema=db._schema))
+    if db._include_tables:
+        names &= set(db._include_tables)
+    names -= set(db._ignore_tables)
+    schema = {}
+    for name in sorted(names):
+        schema[name] = {
+            "columns": [(c["name"], str(c["type"])) for c in inspector.get_columns(name, schema=db._schema)],
+            "pk": inspector.get_pk_constraint(name, schema=db._schema).get("constrained_columns") or [],
+            "fks": [
+                (fk["constrained_columns"], fk["referred_table"], fk["referred_columns"])
+                for fk in inspector.get_foreign_keys(name, schema=db._schema)
+            ],
+        }
+    return schema
+
+
+def _fingerprint(schema: dict) -> str:
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+
+def _is_text(type_: str) -> bool:
+    return any(word in type_.upper() for word in ("CHAR", "TEXT", "CLOB", "STRING"))
+
+
+def _value(value) -> str:
+    value = str(value)
+    return repr(value if len(value) <= SAMPLE_MAX_CHARS else value[:SAMPLE_MAX_CHARS] + "…")
+
+
+def build_schema_digest(db: SQLDatabase, schema: dict | None = None) -> SchemaDigest:
+    """Describe every usable table in one line, followed by the join paths.
+
+    Each line has the row count and the columns with their types, keys and,
+    for text columns with few distinct values, the values themselves, so
+    the agent can filter on them without looking first.
+    """
+    schema = schema if schema is not None else _reflect(db)
+    lines, joins, tables = [], [], {}
+    referenced = {ref for info in schema.values() for _, ref, _ in info["fks"]}
+    with db._engine.connect() as conn:
+        for name, info in schema.items():
+            t = sql_table(name, *(sql_column(c) for c, _ in info["columns"]), schema=db._schema)
+            try:
+                rows = conn.execute(select(func.count()).select_from(t)).scalar()
+            except Exception:
+                rows = None
+            tables[name] = rows
+            keys = {c for cols, _, _ in info["fks"] for c in cols} | set(info["pk"])
+            lookup = name in referenced and sum(_is_text(type_) for _, type_ in info["columns"]) == 1
+            fk_targets = {cols[0]: f"{ref}.{ref_cols[0]}" for cols, ref, ref_cols in info["fks"] if len(cols) == 1}
+            columns = []
+            for col, type_ in info["columns"]:
+                desc = f"{col} {type_}"
+                if col in info["pk"]:
+                    desc += " PK"
+                if col in fk_targets:
+                    desc += f" -> {fk_targets[col]}"
+                if col not in keys and _is_text(type_) and rows is not None and rows <= SAMPLE_MAX_ROWS:
+                    desc += _samples(conn, t, col, lookup)
+                columns.append(desc)
+            lines.append(f"{name} ({rows if rows is not None else '?'} rows): " + "; ".join(columns))
+            for cols, ref, ref_cols in info["fks"]:
+                joins.append(" AND ".join(f"{name}.{c} = {ref}.{r}" for c, r in zip(cols, ref_cols)))
+    text_ = "\n".join(lines)
+    if joins:
+        text_ += "\nJoin paths:\n" + "\n".join(joins)
+    return SchemaDigest(_fingerprint(schema), text_, tables)
+
+
+def _samples(conn, t, col: str, lookup: bool) -> str:
+    """List the values of ``col`` if there are few and they repeat.
+
+    Values of lookup tables (referenced by other tables, with a single text
+    column such as a genre name) are listed even when each occurs once,
+    since questions filter on them by name.
+    """
+    c = t.c[col]
+    try:
+        present, distinct = conn.execute(select(func.count(c), func.count(c.distinct())).select_from(t)).one()
+        if not distinct or distinct > SAMPLE_MAX_DISTINCT or (2 * distinct > present and not lookup):
+            return ""
+        values = conn.execute(select(c).where(c.isnot(None)).distinct()).scalars().all()
+    except Exception:
+        return ""
+    return " in (" + ", ".join(_value(v) for v in sorted(values, key=str)) + ")"
+
+
+class _Entry:
+    def __init__(self):
+        self.db = None
+        # held while this database is opened, probed, reflected or given an agent
+        self.lock = threading.RLock()
+        self.agents = OrderedDict()
+        self.last_used = self.last_checked = time.monotonic()
+        self.digest = None
+        self.schema_checked = 0.0
+
+    def schema_digest(self, now: float) -> SchemaDigest:
+        """Return the digest, re-fingerprinting the schema at most every health check interval.
+
+        When the schema has changed the database is reflected again and
+        cached agents are dropped, since their prompts describe the old one.
+        Call with ``self.lock`` held.
+        """
+        if self.digest is not None and now - self.schema_checked <= HEALTH_CHECK_INTERVAL:
+            return self.digest
+        schema = _reflect(self.db)
+        fingerprint = _fingerprint(schema)
+        if self.digest is None or self.digest.fingerprint != fingerprint:
+            if self.digest is not None:
+                self.db = SQLDatabase(self.db._engine, schema=self.db._schema)
+                self.agents.clear()
+            with _lock:
+                digest = _digests.get(fingerprint)
+            if digest is None:
+                digest = build_schema_digest(self.db, schema)
+            with _lock:
+                _digests[fingerprint] = digest
+                _digests.move_to_end(fingerprint)
+                while len(_digests) > 2 * MAX_DATABASES:
+                    _digests.popitem(last=False)
+            self.digest = digest
+        self.schema_checked = now
+        return self.digest
+
+    def healthy(self) -> bool:
+        try:
+            with self.db._engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        self.agents.clear()
+        if self.db is not None:
+            self.db._engine.dispose()
+
+
+def sqlite_readonly_engine(path):
+    """Return an engine that opens the SQLite file at ``path`` read-only."""
+    uri_path = path.as_posix()
+    creator = lambda: sqlite3.connect(f"file:{uri_path}?mode=ro", uri=True, check_same_thread=False)
+    return create_engine("sqlite:///", creator=creator)
+
+
+def _evict_idle(now: float) -> list:
+    """Drop entries unused for ``IDLE_TIMEOUT`` and return them, to be closed outside the lock."""
+    idle = [u for u, e in _databases.items() if now - e.last_used > IDLE_TIMEOUT]
+    return [_databases.pop(uri) for uri in idle]
+
+
+def _entry(uri: str, engine_factory=None) -> _Entry:
+    """Return the open, recently probed entry for ``uri``.
+
+    The global lock only covers the registry lookup; connecting, probing
+    and reflecting happen under the entry's own lock, so a slow or
+    unreachable database only holds up the callers that use it.
+    """
+    now = time.monotonic()
+    with _lock:
+        retired = _evict_idle(now)
+        entry = _databases.get(uri)
+        if entry is None:
+            entry = _databases[uri] = _Entry()
+            while len(_databases) > MAX_DATABASES:
+                retired.append(_databases.popitem(last=False)[1])
+        _databases.move_to_end(uri)
+        entry.last_used = now
+    for old in retired:
+        old.close()
+
+    with entry.lock:
+        if entry.db is not None and now - entry.last_checked > HEALTH_CHECK_INTERVAL:
+            if entry.healthy():
+                entry.last_checked = now
+            else:
+                entry.close()
+                entry.db = entry.digest = None
+        if entry.db is None:
+            try:
+                engine = engine_factory() if engine_factory else create_engine(uri, pool_pre_ping=True)
+                entry.db = SQLDatabase(engine)
+            except Exception:
+                with _lock:
+                    if _databases.get(uri) is entry:
+                        del _databases[uri]
+                raise
+            entry.last_checked = now
+    return entry
+
+
+def get_database(uri: str, engine_factory=None) -> SQLDatabase:
+    """Return the cached ``SQLDatabase`` for ``uri``, creating it on first use.
+
+    The engine's connection pool and the reflected schema live as long as
+    the entry, so repeat queries skip connecting and reflecting. Pass
+    ``engine_factory`` to build the engine yourself (``uri`` is then only
+    the cache key). Raises whatever ``SQLDatabase`` raises on a bad URI.
+    """
+    entry = _entry(uri, engine_factory)
+    with entry.lock:
+        return entry.db
+
+
+def get_schema_digest(uri: str, engine_factory=None) -> SchemaDigest:
+    """Return the schema digest for ``uri``, computed once per schema fingerprint."""
+    entry = _entry(uri, engine_factory)
+    with entry.lock:
+        return entry.schema_digest(time.monotonic())
+
+
+def schema_prompt(digest: SchemaDigest, agent_type=None, suffix: str | None = None,
+                  format_instructions: str | None = None):
+    """The toolkit's agent prompt with ``digest`` in its system part, for ``create_sql_agent(prompt=...)``.
+
+    The digest is bound as a partial variable instead of being pasted into
+    the template text, so braces in sampled values are never read as
+    prompt variables, whichever agent type parses the template.
+    """
+    prefix = (
+        SQL_PREFIX
+        + "\nThe complete schema is below (table (row count): columns; -> marks a foreign key, "
+        "in (...) lists every value of a column). Write the query from it directly; only use the "
+        "schema tools if a query fails because of a missing table or column.\n\n{schema}"
+    )
+    if agent_type in FUNCTION_AGENT_TYPES:
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(prefix),
+            HumanMessagePromptTemplate.from_template("{input}"),
+            AIMessage(content=suffix or SCHEMA_SUFFIX),
+            MessagesPlaceholder(variable_name="agent_scratchpad"),
+        ])
+    else:
+        from langchain.agents.mrkl.prompt import FORMAT_INSTRUCTIONS
+
+        prompt = PromptTemplate.from_template("\n\n".join(
+            [prefix, "{tools}", format_instructions or FORMAT_INSTRUCTIONS, suffix or SCHEMA_REACT_SUFFIX]
+        ))
+    return prompt.partial(schema=digest.text)
+
+
+def get_sql_agent(uri: str, engine_factory=None, *, llm, **agent_kwargs):
+    """Return a cached ``create_sql_agent`` executor for ``uri`` and ``llm``.
+
+    Unless a ``prefix`` or ``prompt`` is given, the schema digest is put in
+    the system prompt, so the agent does not spend turns discovering tables.
+    """
+    key = (id(llm), tuple(sorted(agent_kwargs.items())))
+    entry = _entry(uri, engine_factory)
+    with entry.lock:
+        digest = entry.schema_digest(time.monotonic())
+        cached = entry.agents.get(key)
+        # the llm is stored alongside so its id cannot be reused by another object
+        if cached is None or cached[0] is not llm:
+            agent_kwargs = dict(agent_kwargs)
+            if "prefix" not in agent_kwargs and "prompt" not in agent_kwargs:
+                agent_kwargs["prompt"] = schema_prompt(
+                    digest, agent_kwargs.get("agent_type"), agent_kwargs.pop("suffix", None),
+                    agent_kwargs.pop("format_instructions", None),
+                )
+            agent_kwargs.setdefault("top_k", sqlresults.AGENT_TOP_K)
+            # query results reach the LLM as a preview plus aggregates, not every row;
+            # the row counts let the query guard size SQLite plans
+            toolkit = sqlresults.BoundedSQLToolkit(db=entry.db, llm=llm, row_counts=digest.tables)
+            cached = entry.agents[key] = (llm, create_sql_agent(llm=llm, toolkit=toolkit, **agent_kwargs))
+            while len(entry.agents) > MAX_AGENTS_PER_DATABASE:
+                entry.agents.popitem(last=False)
+        entry.agents.move_to_end(key)
+        return cached[1]
+
+
+def clear():
+    """Dispose every cached engine and agent."""
+    with _lock:
+        entries = list(_databases.values())
+        _databases.clear()
+    for entry in entries:
+        entry.close()
@@ -1,11 +1,96 @@
-from langchain_core.callbacks import BaseCallbackHandler
+import asyncio
+import json
+import time
+from typing import AsyncGenerator
+
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackHandler
 
 class StreamHandler(BaseCallbackHandler):
-    
-    def __init__(self, container, initial_text=""):
+    """Renders streamed tokens into a Streamlit container.
+
+    Tokens are buffered in a list and the container is redrawn at most once
+    per ``flush_interval`` seconds (or once ``flush_chars`` characters are
+    waiting), because every redraw re-sends the whole answer to the
+    browser. ``on_llm_end`` always draws the final text. Set
+    ``flush_interval=0`` to redraw on every token.
+    """
+
+    def __init__(self, container, initial_text="", flush_interval: float = 0.1, flush_chars: int = 400):
         self.container = container
-        self.text = initial_text
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self._text = initial_text
+        self._pending: list[str] = []
+        self._pending_chars = 0
+        self._last_flush = 0.0
+
+    @property
+    def text(self) -> str:
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+        return self._text
 
     def on_llm_new_token(self, token: str, **kwargs):
-        self.text += token
-        self.container.markdown(self.text)
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval or self._pending_chars >= self.flush_chars:
+            self.flush(now)
+
+    def flush(self, now: float | None = None):
+        if self._pending_chars:
+            self.container.markdown(self.text)
+            self._pending_chars = 0
+        self._last_flush = time.monotonic() if now is None else now
+
+    def on_llm_end(self, response, **kwargs):
+        self.flush()
+
+    def on_llm_error(self, error, **kwargs):
+        self.flush()
+
+
+class SSEStreamHandler(AsyncCallbackHandler):
+    """Forwards LLM tokens and agent tool steps to a queue of SSE events.
+
+    Every event's ``data`` is JSON. Pass a shared ``queue`` and a ``source``
+    name to interleave several runs on one stream.
+    """
+
+    # tool outputs can be whole result sets; the client only needs a preview
+    MAX_TOOL_OUTPUT = 2000
+
+    def __init__(self, queue: asyncio.Queue | None = None, source: str | None = None):
+        self.queue = queue if queue is not None else asyncio.Queue()
+        self.source = source
+
+    async def emit(self, event: str, **data):
+        if self.source is not None:
+            data["source"] = self.source
+        await self.queue.put({"event": event, "data": json.dumps(data)})
+
+    async def on_llm_new_token(self, token: str, **kwargs):
+        # tool-call chunks carry no text
+        if token:
+            await self.emit("token", token=token)
+
+    async def on_tool_start(self, serialized, input_str, *, inputs=None, **kwargs):
+        tool = (serialized or {}).get("name") or kwargs.get("name")
+        await self.emit("tool_start", tool=tool, input=input_str)
+        if tool == "sql_db_query":
+            query = inputs.get("query", input_str) if isinstance(inputs, dict) else input_str
+            await self.emit("sql", query=query)
+
+    async def on_tool_end(self, output, **kwargs):
+        await self.emit("tool_end", output=str(output)[:self.MAX_TOOL_OUTPUT])
+
+    async def events(self) -> AsyncGenerator[dict, None]:
+        while True:
+            event = await self.queue.get()
+            if event is None:
+                break
+            yield event
+
+    async def close(self):
+        await self.queue.put(None)
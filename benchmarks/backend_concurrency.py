@@ -0,0 +1,87 @@
+"""Measure backend/main.py throughput under concurrent load with a fake LLM.
+
+The real LLM and embedding model are swapped for local fakes that answer
+after a fixed delay, so the numbers only reflect how the server schedules
+work. With blocking endpoints N concurrent requests take about N x delay;
+with non-blocking ones they take about one delay.
+
+    python benchmarks/backend_concurrency.py --requests 32 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """Chat model that answers "ok" after ``latency`` seconds."""
+
+    latency: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+def load_app(latency: float):
+    sys.path.insert(0, str(BACKEND_DIR))
+    import utils
+
+    utils.configure_llm = lambda *args, **kwargs: SlowFakeChatModel(latency=latency)
+    utils.configure_embedding_model = lambda: FakeEmbeddings(size=384)
+    import main
+
+    return main.app
+
+
+async def run(app, path: str, requests: int):
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *(client.post(path, json={"message": f"question {i}"}) for i in range(requests))
+            )
+            elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses]
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="/chat/basic")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    elapsed = asyncio.run(run(load_app(args.latency), args.path, args.requests))
+    print(json.dumps({
+        "path": args.path,
+        "requests": args.requests,
+        "llm_latency_s": args.latency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(args.requests / elapsed, 2),
+        "serial_elapsed_s": round(args.requests * args.latency, 3),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Time the per-request components on fixed local fixtures, offline.
+
+The fixtures are built from assets/movie.db, so every run sees the same
+input: one page of text per album, rendered both as a PDF and as HTML
+pages with the usual navigation and script clutter around it.
+
+- ``splitter``: pypdf extraction of the PDF, then RecursiveCharacterTextSplitter
+  at the app's chunk_size=1000 / chunk_overlap=200.
+- ``fastembed``: bge-small embedding throughput over the chunks. Only
+  models already in the FastEmbed cache are used; the run is reported as
+  skipped otherwise (``--download`` fetches the model).
+- ``vectorstore``: NumpyVectorStore build over the chunks, then top-k
+  similarity queries and MMR queries with the app's retriever settings
+  (k=2, fetch_k=4). Vectors come from a hash of the text so only the
+  store is timed.
+- ``html``: websearch.extract_title_snippet, the title/meta extraction
+  behind safe_free_search, per page.
+- ``stream``: StreamHandler fed one answer token by token, with the
+  default throttling and with a redraw on every token; ``rendered_chars``
+  is what would be sent to the browser.
+- ``history``: krishna_india append_history on sessions that already hold
+  ``--history-sizes`` messages, in a temporary database.
+
+Each benchmark prints one JSON line per configuration with the median and
+minimum of ``--repeat`` runs.
+
+    python benchmarks/components.py --only splitter html --repeat 10
+"""
+import argparse
+import json
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "krishna-india-backend"))
+
+MOVIE_DB = ROOT / "assets" / "movie.db"
+# Splitter and retriever settings used in app.py
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+MMR_KWARGS = {"k": 2, "fetch_k": 4}
+DIM = 384
+QUERIES = 20
+# Lines of text per PDF page
+PAGE_LINES = 60
+
+
+def measure(fn, repeat: int):
+    """Run ``fn`` ``repeat`` times; returns the last result and the wall times."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def summary(times, scale: float = 1000.0, unit: str = "ms"):
+    return {f"median_{unit}": round(scale * statistics.median(times), 3), f"min_{unit}": round(scale * min(times), 3)}
+
+
+def emit(bench: str, **fields):
+    print(json.dumps({"bench": bench, **fields}), flush=True)
+
+
+# --- fixtures -------------------------------------------------------------
+
+def albums():
+    """Yield ``(title, artist, tracks)`` for every album in movie.db, in id order."""
+    conn = sqlite3.connect(f"file:{MOVIE_DB}?mode=ro", uri=True)
+    rows = conn.execute(
+        "SELECT a.AlbumId, a.Title, ar.Name, t.Name, t.Composer, g.Name, t.Milliseconds, t.UnitPrice "
+        "FROM Album a JOIN Artist ar USING (ArtistId) JOIN Track t USING (AlbumId) "
+        "LEFT JOIN Genre g USING (GenreId) ORDER BY a.AlbumId, t.TrackId"
+    ).fetchall()
+    conn.close()
+    current, tracks = None, []
+    for album_id, title, artist, *track in rows:
+        if current is not None and album_id != current[0]:
+            yield current[1], current[2], tracks
+            tracks = []
+        current = (album_id, title, artist)
+        tracks.append(track)
+    if current is not None:
+        yield current[1], current[2], tracks
+
+
+def album_text(title: str, artist: str, tracks) -> str:
+    lines = [f"{title} is an album by {artist} with {len(tracks)} tracks."]
+    for n, (name, composer, genre, ms, price) in enumerate(tracks, 1):
+        lines.append(
+            f"Track {n}, {name}, was written by {composer or 'an unknown composer'}. "
+            f"It is filed under {genre or 'no genre'}, runs {ms // 60000}:{ms // 1000 % 60:02d} "
+            f"and sells for {price} dollars."
+        )
+    return " ".join(lines)
+
+
+def _pdf_escape(line: str) -> str:
+    line = line.encode("ascii", "replace").decode()
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(texts) -> bytes:
+    """A plain Helvetica PDF with the ``texts`` wrapped at 90 columns, ``PAGE_LINES`` per page."""
+    lines = []
+    for text in texts:
+        lines.extend(re.findall(r".{1,90}(?:\s|$)", text))
+        lines.append("")
+    pages = [lines[i:i + PAGE_LINES] for i in range(0, len(lines), PAGE_LINES)]
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        body = "".join(f"({_pdf_escape(line.rstrip())}) Tj T*\n" for line in page)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{body}ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def make_html(n: int, title: str, artist: str, tracks, artists) -> str:
+    """An album page; even pages carry a meta description, odd ones fall back to the first paragraph."""
+    meta = f'<meta name="description" content="{title} by {artist}, {len(tracks)} tracks.">' if n % 2 == 0 else ""
+    nav = "".join(f'<li><a href="/artist/{i}">{name}</a></li>' for i, name in enumerate(artists))
+    rows = "".join(
+        f"<tr><td>{i}</td><td>{name}</td><td>{composer or ''}</td><td>{genre or ''}</td><td>{ms}</td></tr>"
+        for i, (name, composer, genre, ms, _) in enumerate(tracks, 1)
+    )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title} - {artist}</title>{meta}'
+        f'<script>window.dataLayer=[{",".join(str(i) for i in range(200))}];</script>'
+        f'<link rel="stylesheet" href="/site.css"></head><body>'
+        f'<header><nav><ul>{nav}</ul></nav></header>'
+        f'<main><h1>{title}</h1><p>{album_text(title, artist, tracks)}</p>'
+        f'<table>{rows}</table></main><footer><p>Catalog page {n}</p></footer></body></html>'
+    )
+
+
+def hash_vector(text: str) -> list[float]:
+    """A deterministic unit vector for ``text``."""
+    vector = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(DIM)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class LookupEmbeddings(Embeddings):
+    """Returns vectors hashed ahead of time, so no model time is measured."""
+
+    def __init__(self, texts):
+        self.vectors = {t: hash_vector(t) for t in texts}
+
+    def embed_documents(self, texts):
+        return [self.vectors[t] for t in texts]
+
+    def embed_query(self, text):
+        return self.vectors.get(text) or hash_vector(text)
+
+
+class FakeContainer:
+    """Stands in for an ``st.empty()``; counts redraws and the characters they send."""
+
+    def __init__(self):
+        self.redraws = 0
+        self.chars = 0
+
+    def markdown(self, text):
+        self.redraws += 1
+        self.chars += len(text)
+
+
+# --- benchmarks -----------------------------------------------------------
+
+def bench_splitter(args, fixtures):
+    import pdfload
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    data = fixtures["pdf"]
+    pages, times = measure(lambda: list(pdfload.load_pdf("movies.pdf", data, workers=1)), args.repeat)
+    emit("pdf_extract", pages=len(pages), bytes=len(data), **summary(times))
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks, times = measure(lambda: splitter.split_documents(pages), args.repeat)
+    emit("splitter", chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, pages=len(pages),
+         chunks=len(chunks), chars=sum(len(p.page_content) for p in pages), **summary(times))
+
+
+def bench_fastembed(args, fixtures):
+    import utils
+    from fastembed import TextEmbedding
+
+    texts = fixtures["chunks"][:args.embed_chunks]
+    try:
+        start = time.perf_counter()
+        model = TextEmbedding(utils.EMBEDDING_MODEL, local_files_only=not args.download)
+        load_s = time.perf_counter() - start
+    except Exception as e:
+        emit("fastembed", model=utils.EMBEDDING_MODEL, skipped=f"model not available: {e}"[:300])
+        return
+    # the first call sets up the ONNX session
+    list(model.embed(texts[:8]))
+    _, times = measure(lambda: list(model.embed(texts, batch_size=args.embed_batch)), args.repeat)
+    emit("fastembed", model=utils.EMBEDDING_MODEL, chunks=len(texts), batch_size=args.embed_batch,
+         load_s=round(load_s, 3), chunks_per_s=round(len(texts) / statistics.median(times), 1), **summary(times))
+
+
+def bench_vectorstore(args, fixtures):
+    from vectorstore import NumpyVectorStore
+
+    texts = fixtures["chunks"]
+    queries = [f"Which tracks did {t.split(' is an album by ')[0][:40]} include?" for t in texts[:QUERIES]]
+    embedding = LookupEmbeddings(texts + queries)
+
+    store, times = measure(lambda: NumpyVectorStore.from_texts(texts, embedding), args.repeat)
+    emit("vectorstore_build", chunks=len(texts), **summary(times))
+
+    k = MMR_KWARGS["k"]
+    _, times = measure(lambda: [store.similarity_search(q, k=k) for q in queries], args.repeat)
+    emit("vectorstore_topk", chunks=len(texts), queries=len(queries), k=k,
+         **summary([t / len(queries) for t in times]))
+
+    retriever = store.as_retriever(search_type="mmr", search_kwargs=MMR_KWARGS)
+    _, times = measure(lambda: [retriever.invoke(q) for q in queries], args.repeat)
+    emit("vectorstore_mmr", chunks=len(texts), queries=len(queries), **MMR_KWARGS,
+         **summary([t / len(queries) for t in times]))
+
+
+def bench_html(args, fixtures):
+    import websearch
+
+    pages = fixtures["html"]
+    _, times = measure(lambda: [websearch.extract_title_snippet(html, url) for url, html in pages], args.repeat)
+    emit("html_extract", pages=len(pages), bytes=sum(len(html) for _, html in pages),
+         **summary([t / len(pages) for t in times]))
+
+
+def bench_stream(args, fixtures):
+    from streaming import StreamHandler
+
+    answer = " ".join(fixtures["chunks"][:8])
+    tokens = re.findall(r"\S+\s*", answer)[:args.tokens]
+    for label, options in (("default", {}), ("every_token", {"flush_interval": 0})):
+        containers = []
+
+        def run():
+            container = FakeContainer()
+            containers.append(container)
+            handler = StreamHandler(container, **options)
+            for token in tokens:
+                handler.on_llm_new_token(token)
+            handler.on_llm_end(None)
+
+        _, times = measure(run, args.repeat)
+        emit("stream", mode=label, tokens=len(tokens), redraws=containers[-1].redraws,
+             rendered_chars=containers[-1].chars, **summary(times))
+
+
+def bench_history(args, fixtures):
+    from krishna_india import utils as history
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history.HISTORY_DIR = Path(tmp)
+        for size in args.history_sizes:
+            history.HISTORY_DB = Path(tmp) / f"history-{size}.db"
+            conn = history._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                    (("bench", "user" if i % 2 == 0 else "assistant", f"message {i}") for i in range(size)),
+                )
+
+            def run():
+                for i in range(args.appends):
+                    history.append_history("bench", "user", f"appended {i}")
+
+            _, times = measure(run, args.repeat)
+            emit("append_history", existing=size, appends=args.appends,
+                 **summary([t / args.appends for t in times]))
+
+
+BENCHES = {
+    "splitter": bench_splitter,
+    "fastembed": bench_fastembed,
+    "vectorstore": bench_vectorstore,
+    "html": bench_html,
+    "stream": bench_stream,
+    "history": bench_history,
+}
+
+
+def build_fixtures(html_pages: int):
+    """The PDF, the HTML pages and the PDF's chunks (split outside of any timing)."""
+    import pdfload
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    catalog = list(albums())
+    artists = sorted({artist for _, artist, _ in catalog})[:50]
+    pdf = make_pdf(album_text(*album) for album in catalog)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return {
+        "pdf": pdf,
+        "chunks": [c.page_content for c in splitter.split_documents(pdfload.load_pdf("movies.pdf", pdf, workers=1))],
+        "html": [
+            (f"https://example.com/album/{n}", make_html(n, *album, artists))
+            for n, album in enumerate(catalog[:html_pages])
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(BENCHES), default=list(BENCHES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--html-pages", type=int, default=50)
+    parser.add_argument("--embed-chunks", type=int, default=256)
+    parser.add_argument("--embed-batch", type=int, default=256)
+    parser.add_argument("--download", action="store_true", help="let FastEmbed download a missing model")
+    parser.add_argument("--tokens", type=int, default=2000, help="tokens in the streamed answer")
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("--appends", type=int, default=100, help="append_history calls per run")
+    args = parser.parse_args()
+
+    fixtures = build_fixtures(args.html_pages)
+    for name in BENCHES:
+        if name in args.only:
+            BENCHES[name](args, fixtures)
+
+
+if __name__ == "__main__":
+    main()
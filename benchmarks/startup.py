@@ -0,0 +1,108 @@
+"""Measure the cold start of app.py and backend/main.py and fail past a budget.
+
+Each target runs in a fresh interpreter with ``-X importtime``:
+
+- ``app``: app.py executed as a plain script (Streamlit's bare mode), which
+  renders the default page, Home.
+- ``backend``: ``import main`` from backend/, i.e. everything uvicorn does
+  before it can accept connections, minus the server itself.
+
+The median wall time of ``--runs`` starts is compared with the target's
+budget and the process exits with status 1 if any target is over. With
+``--report N`` the N slowest modules of the last run are listed by
+cumulative import time. Everything is printed as JSON lines.
+
+    python benchmarks/startup.py --report 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TARGETS = {
+    "app": {"cwd": ROOT, "args": [str(ROOT / "app.py")]},
+    "backend": {"cwd": ROOT / "backend", "args": ["-c", "import main"]},
+}
+# Seconds of median cold start allowed per target
+BUDGETS = {"app": 2.5, "backend": 3.0}
+
+
+def parse_importtime(stderr: str):
+    """Return ``(module, self_us, cumulative_us, depth)`` for each ``-X importtime`` line."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def start(target: str):
+    """Start ``target`` once; returns wall seconds and the parsed import times."""
+    spec = TARGETS[target]
+    # no key: nothing may reach out to a model just to start up
+    env = {**os.environ, "OPENAI_API_KEY": ""}
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *spec["args"]],
+        cwd=spec["cwd"], env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"{target} failed to start:\n{proc.stderr[-2000:]}")
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--report", type=int, default=0, metavar="N",
+                        help="list the N slowest modules by cumulative import time")
+    parser.add_argument("--depth", type=int, default=1,
+                        help="deepest import level listed in the report (0 = imported by the target itself)")
+    for target in TARGETS:
+        parser.add_argument(f"--{target}-budget", type=float, default=BUDGETS[target], metavar="SECONDS")
+    args = parser.parse_args()
+
+    over = False
+    for target in args.targets:
+        times = []
+        for _ in range(args.runs):
+            elapsed, modules = start(target)
+            times.append(elapsed)
+        budget = getattr(args, f"{target}_budget")
+        median = statistics.median(times)
+        over |= median > budget
+        print(json.dumps({
+            "target": target,
+            "runs": args.runs,
+            "median_s": round(median, 3),
+            "min_s": round(min(times), 3),
+            "import_s": round(sum(c for _, _, c, d in modules if d == 0) / 1e6, 3),
+            "budget_s": budget,
+            "ok": median <= budget,
+        }))
+        if args.report:
+            listed = sorted((m for m in modules if m[3] <= args.depth), key=lambda m: -m[2])
+            for name, self_us, cumulative_us, depth in listed[:args.report]:
+                print(json.dumps({
+                    "target": target,
+                    "module": name,
+                    "depth": depth,
+                    "cumulative_ms": round(cumulative_us / 1000, 1),
+                    "self_ms": round(self_us / 1000, 1),
+                }))
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
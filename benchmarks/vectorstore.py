@@ -0,0 +1,93 @@
+"""Compare NumpyVectorStore with DocArrayInMemorySearch at growing corpus sizes.
+
+Vectors are random unit vectors of the bge-small dimension, served by a
+lookup "embedding" so that only the stores themselves are timed: building
+the index, one similarity search and one MMR search with the retriever
+settings used in app.py (k=2, fetch_k=4). Results are printed as JSON lines.
+
+    python benchmarks/vectorstore.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+import sys
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from vectorstore import NumpyVectorStore  # noqa: E402
+
+DIM = 384
+QUERIES = 20
+
+
+class LookupEmbeddings(Embeddings):
+    """Returns precomputed vectors, so no model time is measured."""
+
+    def __init__(self, vectors, queries):
+        self.vectors = {str(i): v for i, v in enumerate(vectors)}
+        self.queries = iter(queries)
+
+    def embed_documents(self, texts):
+        return [self.vectors[t] for t in texts]
+
+    def embed_query(self, text):
+        return next(self.queries)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench(name, build, size, vectors, queries):
+    embedding = LookupEmbeddings(vectors, queries)
+    tracemalloc.start()
+    store, build_s = timed(lambda: build([str(i) for i in range(size)], embedding))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    retriever = store.as_retriever(search_type="mmr", search_kwargs={"k": 2, "fetch_k": 4})
+    _, search_s = timed(lambda: [store.similarity_search("q", k=4) for _ in range(QUERIES // 2)])
+    _, mmr_s = timed(lambda: [retriever.invoke("q") for _ in range(QUERIES // 2)])
+    return {
+        "store": name,
+        "chunks": size,
+        "build_s": round(build_s, 4),
+        "search_ms": round(1000 * search_s / (QUERIES // 2), 3),
+        "mmr_ms": round(1000 * mmr_s / (QUERIES // 2), 3),
+        "memory_mb": round(memory / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--docarray-max", type=int, default=100_000,
+                        help="largest size to run DocArrayInMemorySearch at (it is slow and memory hungry)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from langchain_community.vectorstores import DocArrayInMemorySearch
+
+    stores = {
+        "numpy": lambda texts, emb: NumpyVectorStore.from_texts(texts, emb),
+        "numpy-int8": lambda texts, emb: NumpyVectorStore.from_texts(texts, emb, quantize=True),
+        "docarray": lambda texts, emb: DocArrayInMemorySearch.from_texts(texts, emb),
+    }
+    rng = np.random.default_rng(args.seed)
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, DIM), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = rng.standard_normal((QUERIES, DIM), dtype=np.float32)
+        for name, build in stores.items():
+            if name == "docarray" and size > args.docarray_max:
+                continue
+            print(json.dumps(bench(name, build, size, vectors, queries)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
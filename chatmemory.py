@@ -0,0 +1,138 @@
+"""Chat memory that keeps recent turns verbatim and folds older ones into a summary."""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from pydantic import PrivateAttr
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import SystemMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from utils import logger
+
+# Most recent turns (a question and its answer) kept word for word
+MAX_TURNS = int(os.environ.get("SM_MEMORY_TURNS", 6))
+# Tokens of history (summary plus recent turns) put in front of the model
+MAX_TOKENS = int(os.environ.get("SM_MEMORY_TOKENS", 2000))
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You maintain a running summary of a conversation. Extend the current summary with the new "
+     "lines and return only the updated summary, in a few sentences. Keep names, numbers and "
+     "decisions the user may refer back to; drop small talk."),
+    ("human", "Current summary:\n{summary}\n\nNew lines:\n{lines}"),
+])
+
+# summaries are written here, after the answer has been returned
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+
+def count_tokens(text) -> int:
+    """Rough token count: about four characters per token.
+
+    Cheap and model independent, which is all a history budget needs.
+    """
+    return len(str(text)) // 4 + 1
+
+
+class RollingSummaryMemory(BaseChatMemory):
+    """Memory that sends a summary of older turns plus the last few verbatim.
+
+    At most ``max_turns`` turns are kept word for word, and summary plus
+    turns stay within ``max_token_limit``. Turns that drop out of the
+    window are folded into ``summary`` by ``llm`` on a background thread,
+    so a reply never waits for the summary to be written; until it is,
+    those turns are simply left out.
+    """
+
+    llm: Any
+    memory_key: str = "history"
+    human_prefix: str = "Human"
+    ai_prefix: str = "AI"
+    max_turns: int = MAX_TURNS
+    max_token_limit: int = MAX_TOKENS
+    summary: str = ""
+    # messages of chat_memory already folded into the summary
+    summarized: int = 0
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _pending: Any = PrivateAttr(default=None)
+    # bumped by clear(), so a summary of the old conversation is discarded
+    _generation: int = PrivateAttr(default=0)
+
+    @property
+    def memory_variables(self) -> list[str]:
+        return [self.memory_key]
+
+    def _window(self, messages: list, summary: str) -> int:
+        """How many of the newest ``messages`` fit the turn and token limits."""
+        budget = self.max_token_limit - count_tokens(summary)
+        kept = 0
+        for message in reversed(messages[-2 * self.max_turns:]):
+            budget -= count_tokens(message.content)
+            if budget < 0:
+                break
+            kept += 1
+        return kept
+
+    def load_memory_variables(self, inputs: dict[str, Any]) -> dict[str, Any]:
+        with self._lock:
+            summary = self.summary
+            messages = self.chat_memory.messages[self.summarized:]
+        kept = self._window(messages, summary)
+        messages = messages[len(messages) - kept:]
+        if summary:
+            messages = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] + messages
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {self.memory_key: get_buffer_string(messages, self.human_prefix, self.ai_prefix)}
+
+    def save_context(self, inputs: dict[str, Any], outputs: dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self._schedule()
+
+    async def asave_context(self, inputs: dict[str, Any], outputs: dict[str, str]) -> None:
+        await super().asave_context(inputs, outputs)
+        self._schedule()
+
+    def _schedule(self):
+        with self._lock:
+            if self._pending is None or self._pending.done():
+                self._pending = _executor.submit(self._fold)
+
+    def _fold(self):
+        summarize = SUMMARY_PROMPT | self.llm | StrOutputParser()
+        while True:
+            with self._lock:
+                summary, start, generation = self.summary, self.summarized, self._generation
+                messages = self.chat_memory.messages[start:]
+                old = messages[:len(messages) - self._window(messages, summary)]
+            if not old:
+                return
+            try:
+                summary = summarize.invoke(
+                    {"summary": summary or "(empty)",
+                     "lines": get_buffer_string(old, self.human_prefix, self.ai_prefix)}
+                ).strip()
+            except Exception as e:
+                # the history is only trimmed until the next turn tries again
+                logger.warning(f"Conversation summary failed: {e}")
+                return
+            with self._lock:
+                if self._generation != generation:
+                    return
+                self.summary, self.summarized = summary, start + len(old)
+
+    def wait(self, timeout: float | None = None):
+        """Block until a pending summary update has finished."""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
+
+    def clear(self) -> None:
+        with self._lock:
+            super().clear()
+            self.summary, self.summarized = "", 0
+            self._generation += 1
@@ -0,0 +1,64 @@
+import { useState, useEffect } from 'react'
+
+const PAGE_SIZE = 50
+
+interface ResultPage {
+  columns: string[]
+  rows: (string | number | boolean | null)[][]
+  offset: number
+  has_more: boolean
+}
+
+export default function ResultTable({ resultId }: { resultId: string }) {
+  const [page, setPage] = useState<ResultPage | null>(null)
+  const [offset, setOffset] = useState(0)
+
+  useEffect(() => {
+    fetch(`http://localhost:8000/sql/results/${resultId}?offset=${offset}&limit=${PAGE_SIZE}`)
+      .then(res => (res.ok ? res.json() : null))
+      .then(setPage)
+  }, [resultId, offset])
+
+  if (!page) return null
+  return (
+    <div className="p-2 max-h-80 overflow-auto">
+      <table className="text-sm border-collapse">
+        <thead>
+          <tr>
+            {page.columns.map(c => (
+              <th key={c} className="border px-2 py-1 text-left">{c}</th>
+            ))}
+          </tr>
+        </thead>
+        <tbody>
+          {page.rows.map((row, i) => (
+            <tr key={i}>
+              {row.map((v, j) => (
+                <td key={j} className="border px-2 py-1">{v === null ? '' : String(v)}</td>
+              ))}
+            </tr>
+          ))}
+        </tbody>
+      </table>
+      <div className="flex space-x-2 mt-2">
+        <button
+          className="px-2 py-1 border rounded disabled:opacity-50"
+          disabled={offset === 0}
+          onClick={() => setOffset(Math.max(0, offset - PAGE_SIZE))}
+        >
+          Previous
+        </button>
+        <span className="px-2 py-1">
+          Rows {page.offset + 1}–{page.offset + page.rows.length}
+        </span>
+        <button
+          className="px-2 py-1 border rounded disabled:opacity-50"
+          disabled={!page.has_more}
+          onClick={() => setOffset(offset + PAGE_SIZE)}
+        >
+          Next
+        </button>
+      </div>
+    </div>
+  )
+}
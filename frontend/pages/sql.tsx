@@ -2,9 +2,11 @@ import { useState, useEffect } from 'react'
 import Sidebar from '../components/Sidebar'
 import ChatWindow, { Message } from '../components/ChatWindow'
 import ChatInput from '../components/ChatInput'
+import ResultTable from '../components/ResultTable'
 
 export default function SqlPage() {
   const [messages, setMessages] = useState<Message[]>([])
+  const [resultId, setResultId] = useState<string | null>(null)
 
   const sendMessage = async (msg: string) => {
     setMessages(m => [...m, { role: 'user', text: msg }])
@@ -16,6 +18,8 @@ export default function SqlPage() {
     const data = await res.json()
     if (data.messages && data.messages[0]) {
       setMessages(m => [...m, { role: 'assistant', text: data.messages[0].text }])
+      // rows of the query behind the answer, paged from the backend
+      setResultId(data.messages[0].result_id || null)
     }
   }
 
@@ -24,6 +28,7 @@ export default function SqlPage() {
       <Sidebar />
       <div className="flex flex-col flex-1">
         <ChatWindow messages={messages} />
+        {resultId && <ResultTable key={resultId} resultId={resultId} />}
         <ChatInput onSend={sendMessage} />
       </div>
     </div>
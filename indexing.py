@@ -0,0 +1,191 @@
+"""On-disk vector indexes keyed by the hash of their source content."""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents.base import Document
+
+INDEX_DIR = Path(os.environ.get("SM_INDEX_DIR", Path(__file__).resolve().parent / ".index"))
+
+
+def index_key(blobs, **settings) -> str:
+    """Hash the source bytes together with the settings that shape the index.
+
+    The order of ``blobs`` does not matter, so re-uploading the same files in a
+    different order hits the same index.
+    """
+    digest = hashlib.sha256()
+    for blob_hash in sorted(hashlib.sha256(blob).hexdigest() for blob in blobs):
+        digest.update(blob_hash.encode())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _index_path(key: str) -> Path:
+    return INDEX_DIR / key
+
+
+def _read_index(path: Path):
+    try:
+        with (path / "chunks.json").open() as f:
+            chunks = json.load(f)
+        vectors = np.load(path / "vectors.npy")
+    except (OSError, ValueError):
+        return None
+    docs = [Document(page_content=c["text"], metadata=c["metadata"]) for c in chunks]
+    return docs, vectors
+
+
+def load_index(key: str):
+    """Return ``(docs, vectors)`` for ``key`` or ``None`` if it was never built."""
+    return _read_index(_index_path(key))
+
+
+def _as_matrix(docs, vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors if vectors.ndim == 2 else vectors.reshape(len(docs), -1 if len(docs) else 0)
+
+
+def _write_index(path: Path, docs, vectors, meta=None, blocks=None) -> None:
+    """Build an index directory next to ``path`` and move it into place.
+
+    An existing index at ``path`` is swapped out, so readers see either
+    the old or the new one, never a mix.
+    """
+    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=INDEX_DIR, prefix=".build-"))
+    try:
+        with (staging / "chunks.json").open("w") as f:
+            json.dump([{"text": d.page_content, "metadata": d.metadata} for d in docs], f, default=str)
+        np.save(staging / "vectors.npy", _as_matrix(docs, vectors))
+        if meta is not None:
+            with (staging / "meta.json").open("w") as f:
+                json.dump(meta, f)
+        if blocks is not None:
+            with (staging / "blocks.json").open("w") as f:
+                json.dump(blocks, f)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            retired = Path(tempfile.mkdtemp(dir=INDEX_DIR, prefix=".old-"))
+            os.replace(path, retired / "index")
+            shutil.rmtree(retired, ignore_errors=True)
+        os.replace(staging, path)
+    except OSError:
+        # another process finished the same index first
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def save_index(key: str, docs, vectors) -> None:
+    """Write an index atomically so concurrent readers never see half of it."""
+    path = _index_path(key)
+    if not path.exists():
+        _write_index(path, docs, vectors)
+
+
+# --- Per-URL site indexes ----------------------------------------------------
+# Each indexed website page is stored on its own under .index/sites/, with
+# the validators needed for a conditional re-fetch, so adding a URL only
+# indexes that URL and unchanged pages are never downloaded or embedded again.
+
+# Seconds before a stored page is revalidated with the server
+SITE_REFRESH_INTERVAL = 3600
+
+
+def _site_path(url: str) -> Path:
+    return INDEX_DIR / "sites" / hashlib.sha256(url.encode()).hexdigest()
+
+
+def load_site_meta(url: str):
+    """Return what is stored about ``url`` without its chunks and vectors, or ``None``.
+
+    The dict holds ``url``, ``etag``, ``last_modified``, ``content_hash``
+    (of the extracted text), ``fetched_at``, ``indexed_at``, ``chunks``
+    (the chunk count) and the keys of the text blocks the page ``kept`` and
+    of those it ``dropped`` as duplicates of another page's. That is
+    enough to decide whether the page needs a re-fetch or a re-index.
+    """
+    try:
+        with (_site_path(url) / "meta.json").open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_site(url: str):
+    """Return the stored index for ``url`` as a dict, or ``None``.
+
+    The metadata of ``load_site_meta`` plus ``docs`` and ``vectors``.
+    """
+    site = load_site_meta(url)
+    loaded = _read_index(_site_path(url))
+    if site is None or loaded is None:
+        return None
+    site["docs"], site["vectors"] = loaded
+    return site
+
+
+def site_is_stale(site) -> bool:
+    return time.time() - site["fetched_at"] > SITE_REFRESH_INTERVAL
+
+
+def conditional_headers(site):
+    """Request headers that let the server answer 304 for an unchanged page."""
+    headers = {}
+    if site is not None:
+        if site.get("etag"):
+            headers["If-None-Match"] = site["etag"]
+        if site.get("last_modified"):
+            headers["If-Modified-Since"] = site["last_modified"]
+    return headers
+
+
+def touch_site(site) -> None:
+    """Record that ``site`` was revalidated and is still current."""
+    site["fetched_at"] = time.time()
+    meta = {k: v for k, v in site.items() if k not in ("docs", "vectors")}
+    path = _site_path(site["url"]) / "meta.json"
+    staging = path.with_suffix(".tmp")
+    try:
+        with staging.open("w") as f:
+            json.dump(meta, f)
+        os.replace(staging, path)
+    except OSError:
+        pass
+
+
+def load_site_blocks(url: str):
+    """Return every text block extracted from ``url``, duplicates included, or ``None``."""
+    try:
+        with (_site_path(url) / "blocks.json").open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_site(url: str, docs, vectors, etag=None, last_modified=None, content_hash=None,
+              blocks=(), kept=(), dropped=(), fetched_at=None):
+    """Store a page's chunks and vectors and return the site dict.
+
+    ``blocks`` are all the text blocks extracted from the page, kept so it
+    can be indexed again without a fetch; ``kept`` and ``dropped`` are the
+    keys of the ones indexed here and of the ones left to other pages.
+    """
+    now = time.time()
+    site = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_hash": content_hash,
+        "fetched_at": fetched_at or now,
+        "indexed_at": now,
+        "chunks": len(docs),
+        "kept": sorted(kept),
+        "dropped": sorted(dropped),
+    }
+    _write_index(_site_path(url), docs, vectors, meta=site, blocks=list(blocks))
+    return {**site, "docs": docs, "vectors": _as_matrix(docs, vectors)}
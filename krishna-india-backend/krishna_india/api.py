@@ -1,10 +1,12 @@
 import asyncio
 import os
-from fastapi import FastAPI, Query
+from fastapi import BackgroundTasks, FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
 from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 
-from .utils import get_openai_client, load_history, append_history
+from .utils import get_openai_client, append_history
+from .memory import SUMMARY_PROMPT, build_messages, update_summary
 from .streaming import StreamHandler
 
 app = FastAPI(title="Krishna India API")
@@ -20,10 +22,19 @@ client = get_openai_client()
 MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 DUMMY_MODE = os.environ.get("OPENAI_API_KEY") == "dummy"
 
+async def summarize(summary: str, lines: str) -> str:
+    if DUMMY_MODE:
+        return "test summary"
+    response = await client.chat.completions.create(model=MODEL, messages=[
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Current summary:\n{summary or '(empty)'}\n\nNew lines:\n{lines}"},
+    ])
+    return response.choices[0].message.content
+
 @app.post("/chat")
-async def chat(message: str, session_id: str):
-    history = load_history(session_id)
-    messages = history + [{"role": "user", "content": message}]
+async def chat(message: str, session_id: str, background_tasks: BackgroundTasks):
+    # summary of older turns plus the last few, within a token budget
+    messages = build_messages(session_id, message)
     if DUMMY_MODE:
         reply = "test reply"
     else:
@@ -31,35 +42,46 @@ async def chat(message: str, session_id: str):
         reply = response.choices[0].message.content
     append_history(session_id, "user", message)
     append_history(session_id, "assistant", reply)
+    # older turns are summarized after the reply has been sent
+    background_tasks.add_task(update_summary, session_id, summarize)
     return {"reply": reply}
 
 @app.get("/stream")
 async def stream(message: str = Query(...), session_id: str = Query(...)):
-    history = load_history(session_id)
-    messages = history + [{"role": "user", "content": message}]
+    messages = build_messages(session_id, message)
     handler = StreamHandler()
 
     async def run_llm():
-        if DUMMY_MODE:
-            for tok in ["test", " ", "stream"]:
-                await handler.on_llm_new_token(tok)
-            await handler.close()
-        else:
-            await client.chat.completions.create(
-                model=MODEL,
-                messages=messages,
-                stream=True,
-                extra_headers={"Accept": "text/event-stream"},
-                callbacks=[handler],
-            )
+        try:
+            if DUMMY_MODE:
+                for tok in ["test", " ", "stream"]:
+                    await handler.on_llm_new_token(tok)
+            else:
+                response = await client.chat.completions.create(model=MODEL, messages=messages, stream=True)
+                try:
+                    async for chunk in response:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            await handler.on_llm_new_token(chunk.choices[0].delta.content)
+                finally:
+                    # also runs on cancellation, closing the upstream HTTP stream
+                    await response.close()
+        except Exception:
+            # end the event stream; the error is re-raised by `await task`
             await handler.close()
+            raise
+        await handler.close()
         append_history(session_id, "user", message)
         append_history(session_id, "assistant", handler.text)
 
     async def event_generator():
         task = asyncio.create_task(run_llm())
-        async for token in handler.generator():
-            yield token
-        await task
+        try:
+            async for token in handler.generator():
+                yield token
+            await task
+            yield "[DONE]"
+        finally:
+            # the client disconnected (or the run failed): stop the upstream request
+            task.cancel()
 
-    return EventSourceResponse(event_generator())
+    return EventSourceResponse(event_generator(), background=BackgroundTask(update_summary, session_id, summarize))
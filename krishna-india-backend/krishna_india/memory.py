@@ -0,0 +1,66 @@
+"""Prompt history within a token budget: a running summary plus the last turns."""
+import logging
+import os
+
+from .utils import load_messages, load_summary, save_summary
+
+logger = logging.getLogger(__name__)
+
+# Most recent messages sent word for word are the last MAX_TURNS question/answer pairs
+MAX_TURNS = int(os.getenv("HISTORY_TURNS", 6))
+# Tokens of history (summary, recent messages and the new message) sent per request
+MAX_TOKENS = int(os.getenv("HISTORY_TOKENS", 2000))
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation. Extend the current summary with the new "
+    "lines and return only the updated summary, in a few sentences. Keep names, numbers and "
+    "decisions the user may refer back to; drop small talk."
+)
+
+def count_tokens(text: str) -> int:
+    """Rough token count: about four characters per token."""
+    return len(text) // 4 + 1
+
+def _window(rows, summary: str, reserve: int = 0) -> int:
+    """How many of the newest ``rows`` fit the turn and token limits."""
+    budget = MAX_TOKENS - count_tokens(summary) - reserve
+    kept = 0
+    for _, _, content in reversed(rows[-2 * MAX_TURNS:]):
+        budget -= count_tokens(content)
+        if budget < 0:
+            break
+        kept += 1
+    return kept
+
+def build_messages(session_id: str, message: str):
+    """Chat messages for a new ``message``: summary, recent turns, then the message.
+
+    Turns older than the window that are not yet in the summary are left
+    out until ``update_summary`` has folded them in.
+    """
+    summary, upto = load_summary(session_id)
+    rows = load_messages(session_id, after=upto, limit=2 * MAX_TURNS)
+    rows = rows[len(rows) - _window(rows, summary, count_tokens(message)):]
+    messages = [{"role": "system", "content": f"Summary of the earlier conversation: {summary}"}] if summary else []
+    messages += [{"role": role, "content": content} for _, role, content in rows]
+    return messages + [{"role": "user", "content": message}]
+
+async def update_summary(session_id: str, summarize):
+    """Fold the turns that have left the window into the session's summary.
+
+    ``summarize(summary, lines)`` is a coroutine returning the new summary.
+    Meant to run after the response has been sent; failures are logged
+    and retried with the next turn.
+    """
+    summary, upto = load_summary(session_id)
+    rows = load_messages(session_id, after=upto)
+    old = rows[:len(rows) - _window(rows, summary)]
+    if not old:
+        return
+    lines = "\n".join(f"{role}: {content}" for _, role, content in old)
+    try:
+        summary = await summarize(summary, lines)
+    except Exception:
+        logger.exception("Updating the summary of session %s failed", session_id)
+        return
+    save_summary(session_id, summary.strip(), old[-1][0], upto)
@@ -1,17 +1,52 @@
 import asyncio
+import time
 from typing import AsyncGenerator
 from langchain_core.callbacks import AsyncCallbackHandler
 
 class StreamHandler(AsyncCallbackHandler):
-    """Collects tokens from an LLM and exposes them as an async generator."""
+    """Collects tokens from an LLM and exposes them as an async generator.
 
-    def __init__(self):
-        self.queue: asyncio.Queue[str | None] = asyncio.Queue()
-        self.text = ""
+    Tokens are coalesced into frames of at least ``flush_chars`` characters,
+    or whatever arrived within ``flush_interval`` seconds, to cut per-event
+    overhead. The first token is sent at once so time-to-first-byte is not
+    delayed. The queue holds at most ``maxsize`` frames; when the consumer
+    falls behind, ``on_llm_new_token`` blocks, which slows down reading
+    from the provider instead of buffering without bound.
+    """
+
+    def __init__(self, maxsize: int = 64, flush_chars: int = 32, flush_interval: float = 0.05):
+        self.queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=maxsize)
+        self.flush_chars = flush_chars
+        self.flush_interval = flush_interval
+        self._parts: list[str] = []
+        self._pending: list[str] = []
+        self._pending_chars = 0
+        self._last_flush: float | None = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
 
     async def on_llm_new_token(self, token: str, **kwargs):
-        self.text += token
-        await self.queue.put(token)
+        if not token:
+            return
+        self._parts.append(token)
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        if (
+            self._last_flush is None
+            or self._pending_chars >= self.flush_chars
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            await self.flush()
+
+    async def flush(self):
+        if self._pending:
+            frame = "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+            await self.queue.put(frame)
+        self._last_flush = time.monotonic()
 
     async def generator(self) -> AsyncGenerator[str, None]:
         while True:
@@ -21,4 +56,5 @@ class StreamHandler(AsyncCallbackHandler):
             yield token
 
     async def close(self):
+        await self.flush()
         await self.queue.put(None)
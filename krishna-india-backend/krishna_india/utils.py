@@ -1,5 +1,7 @@
 import os
 import json
+import sqlite3
+import threading
 from pathlib import Path
 
 import openai
@@ -8,29 +10,129 @@ from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
 HISTORY_DIR = Path(__file__).resolve().parent / "history"
 HISTORY_DIR.mkdir(parents=True, exist_ok=True)
 
-def get_openai_client() -> openai.OpenAI:
-    """Create OpenAI client using environment variable."""
+def get_openai_client() -> openai.AsyncOpenAI:
+    """Create async OpenAI client using environment variable."""
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set")
-    return openai.OpenAI(api_key=api_key)
+    return openai.AsyncOpenAI(api_key=api_key)
 
 def configure_embedding():
     """Return embedding model used by the app."""
     return FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
 
+HISTORY_DB = HISTORY_DIR / "history.db"
+
+_local = threading.local()
+
+def _connect() -> sqlite3.Connection:
+    """Return this thread's connection to the history database.
+
+    WAL mode lets readers run alongside a writer, and appends are single-row
+    inserts, so concurrent requests on one session never lose messages.
+    """
+    conns = _local.__dict__.setdefault("conns", {})
+    conn = conns.get(HISTORY_DB)
+    if conn is None:
+        conn = sqlite3.connect(HISTORY_DB, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "session_id TEXT NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, upto INTEGER NOT NULL)"
+        )
+        conns[HISTORY_DB] = conn
+    return conn
+
 def _history_path(session_id: str) -> Path:
     return HISTORY_DIR / f"{session_id}.json"
 
-def load_history(session_id: str):
+def _import_legacy_history(conn: sqlite3.Connection, session_id: str) -> None:
+    """Move a pre-SQLite JSON history file into the database, once."""
     path = _history_path(session_id)
-    if path.exists():
+    if not path.exists():
+        return
+    try:
         with path.open() as f:
-            return json.load(f)
-    return []
+            history = json.load(f)
+    except FileNotFoundError:
+        # another worker migrated it between the check and the open
+        return
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM messages WHERE session_id = ? LIMIT 1", (session_id,)).fetchone() is None:
+            conn.executemany(
+                "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                [(session_id, m["role"], m["content"]) for m in history],
+            )
+    try:
+        path.rename(path.with_suffix(".json.migrated"))
+    except FileNotFoundError:
+        pass
+
+def load_history(session_id: str, limit: int | None = None):
+    """Return the session's messages in order, or only the last ``limit``."""
+    conn = _connect()
+    _import_legacy_history(conn, session_id)
+    if limit is None:
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()[::-1]
+    return [{"role": role, "content": content} for role, content in rows]
 
 def append_history(session_id: str, role: str, content: str):
-    history = load_history(session_id)
-    history.append({"role": role, "content": content})
-    with _history_path(session_id).open("w") as f:
-        json.dump(history, f)
+    conn = _connect()
+    _import_legacy_history(conn, session_id)
+    conn.execute(
+        "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)", (session_id, role, content)
+    )
+
+def load_messages(session_id: str, after: int = 0, limit: int | None = None):
+    """Return ``(id, role, content)`` rows after message id ``after``, oldest first.
+
+    With ``limit`` only the newest ``limit`` of them are returned.
+    """
+    conn = _connect()
+    _import_legacy_history(conn, session_id)
+    rows = conn.execute(
+        "SELECT id, role, content FROM messages WHERE session_id = ? AND id > ? ORDER BY id DESC LIMIT ?",
+        (session_id, after, -1 if limit is None else limit),
+    ).fetchall()
+    return rows[::-1]
+
+def load_summary(session_id: str):
+    """Return the session's ``(summary, upto)``; ``upto`` is the last message id it covers."""
+    row = _connect().execute(
+        "SELECT summary, upto FROM summaries WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    return row if row is not None else ("", 0)
+
+def save_summary(session_id: str, summary: str, upto: int, previous_upto: int):
+    """Store a summary covering messages up to id ``upto``.
+
+    Only replaces the one it was built from (ending at ``previous_upto``),
+    so of two concurrent updates the later one is dropped, not the newer.
+    Returns whether it was stored.
+    """
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        current = conn.execute("SELECT upto FROM summaries WHERE session_id = ?", (session_id,)).fetchone()
+        if (current[0] if current else 0) != previous_upto:
+            return False
+        conn.execute(
+            "INSERT OR REPLACE INTO summaries (session_id, summary, upto) VALUES (?, ?, ?)",
+            (session_id, summary, upto),
+        )
+    return True
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from krishna_india import memory, utils
+
+
+@pytest.fixture(autouse=True)
+def history_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "HISTORY_DIR", tmp_path)
+    monkeypatch.setattr(utils, "HISTORY_DB", tmp_path / "history.db")
+    monkeypatch.setattr(memory, "MAX_TURNS", 2)
+    return tmp_path
+
+def add_turns(session_id, start, stop):
+    for i in range(start, stop):
+        utils.append_history(session_id, "user", f"q{i}")
+        utils.append_history(session_id, "assistant", f"a{i}")
+
+def test_only_last_turns_sent():
+    add_turns("s", 0, 5)
+    messages = memory.build_messages("s", "next")
+    assert [m["content"] for m in messages] == ["q3", "a3", "q4", "a4", "next"]
+
+def test_token_budget_drops_oldest(monkeypatch):
+    monkeypatch.setattr(memory, "MAX_TOKENS", 30)
+    utils.append_history("s", "user", "x" * 200)
+    utils.append_history("s", "assistant", "short")
+    messages = memory.build_messages("s", "next")
+    assert [m["content"] for m in messages] == ["short", "next"]
+
+def test_old_turns_folded_into_summary():
+    calls = []
+
+    async def summarize(summary, lines):
+        calls.append((summary, lines))
+        return f"{summary}+{lines.count('user:')}"
+
+    add_turns("s", 0, 3)
+    asyncio.run(memory.update_summary("s", summarize))
+    add_turns("s", 3, 5)
+    asyncio.run(memory.update_summary("s", summarize))
+    asyncio.run(memory.update_summary("s", summarize))
+
+    assert calls == [("", "user: q0\nassistant: a0"), ("+1", "user: q1\nassistant: a1\nuser: q2\nassistant: a2")]
+    messages = memory.build_messages("s", "next")
+    assert messages[0] == {"role": "system", "content": "Summary of the earlier conversation: +1+2"}
+    assert [m["content"] for m in messages[1:]] == ["q3", "a3", "q4", "a4", "next"]
+
+def test_failed_summary_keeps_history():
+    async def summarize(summary, lines):
+        raise RuntimeError("down")
+
+    add_turns("s", 0, 4)
+    asyncio.run(memory.update_summary("s", summarize))
+    assert utils.load_summary("s") == ("", 0)
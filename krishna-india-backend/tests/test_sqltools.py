@@ -0,0 +1,45 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+# sqltools lives at the repository root, next to app.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import sqltools  # noqa: E402
+
+
+class RecordingChatModel(FakeListChatModel):
+    prompts: list = []
+
+    def _stream(self, messages, *args, **kwargs):
+        # agents stream from the model
+        self.prompts.append("\n".join(str(m.content) for m in messages))
+        return super()._stream(messages, *args, **kwargs)
+
+
+@pytest.fixture
+def db_uri(tmp_path):
+    path = tmp_path / "formats.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE exports (format TEXT)")
+    conn.executemany("INSERT INTO exports VALUES (?)", [("{json}",), ("csv",)] * 3)
+    conn.commit()
+    conn.close()
+    yield f"sqlite:///{path}"
+    sqltools.clear()
+
+
+@pytest.mark.parametrize("agent_type, answer", [
+    ("zero-shot-react-description", "Final Answer: done"),
+    ("openai-tools", "done"),
+])
+def test_braces_in_sampled_values_reach_the_prompt(db_uri, agent_type, answer):
+    assert "'{json}'" in sqltools.get_schema_digest(db_uri).text
+    llm = RecordingChatModel(responses=[answer], prompts=[])
+    agent = sqltools.get_sql_agent(db_uri, llm=llm, agent_type=agent_type)
+    assert agent.invoke({"input": "Which formats exist?"})["output"] == "done"
+    assert "'{json}'" in llm.prompts[0]
+    assert "correct sqlite query" in llm.prompts[0]
@@ -0,0 +1,42 @@
+import asyncio
+
+from krishna_india.streaming import StreamHandler
+
+
+async def collect(handler):
+    return [frame async for frame in handler.generator()]
+
+def test_first_token_sent_then_small_tokens_coalesced():
+    async def run():
+        handler = StreamHandler(flush_chars=8, flush_interval=60)
+        for tok in ["Hi", " a", "b", "c", "d", "e", "f", "g", "h", "!"]:
+            await handler.on_llm_new_token(tok)
+        await handler.close()
+        return handler, await collect(handler)
+
+    handler, frames = asyncio.run(run())
+    assert frames == ["Hi", " abcdefg", "h!"]
+    assert handler.text == "Hi abcdefgh!"
+
+def test_slow_consumer_applies_backpressure():
+    async def run():
+        handler = StreamHandler(maxsize=2, flush_chars=1)
+        produced = 0
+
+        async def produce():
+            nonlocal produced
+            for tok in "abcdef":
+                await handler.on_llm_new_token(tok)
+                produced += 1
+            await handler.close()
+
+        task = asyncio.create_task(produce())
+        await asyncio.sleep(0.01)
+        stalled_at = produced
+        frames = await collect(handler)
+        await task
+        return stalled_at, frames
+
+    stalled_at, frames = asyncio.run(run())
+    assert stalled_at < 6
+    assert "".join(frames) == "abcdef"
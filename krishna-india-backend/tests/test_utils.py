@@ -0,0 +1,39 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from krishna_india import utils
+
+
+@pytest.fixture(autouse=True)
+def history_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "HISTORY_DIR", tmp_path)
+    monkeypatch.setattr(utils, "HISTORY_DB", tmp_path / "history.db")
+    return tmp_path
+
+def test_append_and_load():
+    utils.append_history("s1", "user", "hi")
+    utils.append_history("s1", "assistant", "hello")
+    utils.append_history("s2", "user", "other")
+    assert utils.load_history("s1") == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+    assert utils.load_history("missing") == []
+
+def test_load_last_n():
+    for i in range(10):
+        utils.append_history("s", "user", str(i))
+    assert [m["content"] for m in utils.load_history("s", limit=3)] == ["7", "8", "9"]
+
+def test_concurrent_appends_keep_every_message():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: utils.append_history("s", "user", str(i)), range(200)))
+    assert sorted(int(m["content"]) for m in utils.load_history("s")) == list(range(200))
+
+def test_legacy_json_history_is_imported(history_dir):
+    (history_dir / "old.json").write_text(json.dumps([{"role": "user", "content": "before"}]))
+    utils.append_history("old", "assistant", "after")
+    assert [m["content"] for m in utils.load_history("old")] == ["before", "after"]
+    assert not (history_dir / "old.json").exists()
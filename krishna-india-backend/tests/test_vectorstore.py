@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# indexing and vectorstore live at the repository root, next to app.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import indexing  # noqa: E402
+from vectorstore import NumpyVectorStore  # noqa: E402
+
+
+class FixedEmbeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+def test_empty_index_round_trip(tmp_path, monkeypatch):
+    # an upload with no extractable text is saved as an empty index
+    monkeypatch.setattr(indexing, "INDEX_DIR", tmp_path)
+    indexing.save_index("empty", [], [])
+    docs, vectors = indexing.load_index("empty")
+
+    store = NumpyVectorStore.from_embeddings(docs, vectors, FixedEmbeddings())
+    assert len(store) == 0
+    assert store.similarity_search("anything", k=2) == []
+    retriever = store.as_retriever(search_type="mmr", search_kwargs={"k": 2, "fetch_k": 4})
+    assert retriever.invoke("anything") == []
+
+
+def test_empty_add_keeps_existing_rows():
+    store = NumpyVectorStore.from_texts(["a", "b"], FixedEmbeddings())
+    assert store.add_embeddings([], np.empty((0, 0))) == []
+    assert len(store) == 2
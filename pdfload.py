@@ -0,0 +1,65 @@
+"""PDF text extraction straight from uploaded bytes, spread over worker processes."""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents.base import Document
+from pypdf import PdfReader
+
+# Worker processes for page extraction; pypdf is pure Python, so threads
+# would serialize on the GIL
+WORKERS = int(os.environ.get("SM_PDF_WORKERS", os.cpu_count() or 1))
+# Pages per worker task; each task receives a copy of the file's bytes
+PAGES_PER_TASK = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the app process runs threads (Streamlit, uvicorn)
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _extract(data: bytes, start: int, stop: int) -> list[str]:
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def load_pdf(name: str, data: bytes, workers: int = WORKERS):
+    """Yield one ``Document`` per page of the PDF in ``data``, in page order.
+
+    Metadata matches ``PyPDFLoader`` (``source`` and 0-based ``page``). Large
+    files are split into page ranges extracted in parallel, and each page is
+    yielded as soon as it and the pages before it are done, so splitting and
+    embedding start while later pages are still being parsed.
+    """
+    pages = len(PdfReader(io.BytesIO(data)).pages)
+    if workers <= 1 or pages <= PAGES_PER_TASK:
+        ranges = [(0, pages)]
+        tasks = None
+    else:
+        pool = _get_pool()
+        ranges = [(start, min(start + PAGES_PER_TASK, pages)) for start in range(0, pages, PAGES_PER_TASK)]
+        tasks = [pool.submit(_extract, data, start, stop) for start, stop in ranges]
+    try:
+        for n, (start, stop) in enumerate(ranges):
+            texts = _extract(data, start, stop) if tasks is None else tasks[n].result()
+            for page, text in enumerate(texts, start):
+                yield Document(page_content=text, metadata={"source": name, "page": page})
+    finally:
+        # consumer stopped early: drop the ranges nobody will read
+        for task in tasks or ():
+            task.cancel()
+
+
+def load_pdfs(files, workers: int = WORKERS):
+    """Yield the pages of every ``(name, data)`` pair in ``files``."""
+    for name, data in files:
+        yield from load_pdf(name, data, workers)
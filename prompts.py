@@ -0,0 +1,106 @@
+"""Versioned prompts shipped with the app, in place of LangChain Hub pulls.
+
+Each prompt is a template file ``assets/prompts/<name>.v<version>.txt``;
+the highest version is used unless one is pinned with
+``SM_PROMPT_<NAME>_VERSION`` (``react-chat`` -> ``SM_PROMPT_REACT_CHAT_VERSION``).
+Files are read once per process. With ``SM_PROMPT_REFRESH`` set to a number
+of seconds, prompts that came from the Hub are re-pulled in the background
+at that interval and replace the shipped text in memory when it changed;
+requests never wait for the Hub.
+"""
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from langchain_core.prompts import PromptTemplate
+
+from utils import logger
+
+PROMPT_DIR = Path(__file__).resolve().parent / "assets" / "prompts"
+# Seconds between background Hub refreshes; 0 turns them off
+REFRESH_INTERVAL = float(os.environ.get("SM_PROMPT_REFRESH", 0))
+# Where each shipped prompt came from, for background refreshes
+HUB_SOURCES = {
+    "react-chat": "hwchase17/react-chat",
+}
+
+_FILE = re.compile(r"^(?P<name>.+)\.v(?P<version>\d+)\.txt$")
+
+
+@dataclass(frozen=True)
+class Prompt:
+    name: str
+    # shipped version number, or "hub" once replaced by a refresh
+    version: "int | str"
+    template: PromptTemplate
+
+
+_lock = threading.Lock()
+_prompts: dict[str, Prompt] = {}
+_refresher = None
+
+
+def versions(name: str) -> list[int]:
+    """Shipped versions of ``name``, oldest first."""
+    found = (_FILE.match(path.name) for path in PROMPT_DIR.glob(f"{name}.v*.txt"))
+    return sorted(int(m["version"]) for m in found if m and m["name"] == name)
+
+
+def _load(name: str) -> Prompt:
+    pinned = os.environ.get(f"SM_PROMPT_{re.sub(r'[^A-Z0-9]', '_', name.upper())}_VERSION")
+    available = versions(name)
+    if not available:
+        raise KeyError(f"No prompt named {name!r} in {PROMPT_DIR}")
+    version = int(pinned) if pinned else available[-1]
+    text = (PROMPT_DIR / f"{name}.v{version}.txt").read_text(encoding="utf-8")
+    # files end with a newline; templates do not
+    return Prompt(name, version, PromptTemplate.from_template(text.rstrip("\n")))
+
+
+def get(name: str) -> Prompt:
+    """Return the prompt ``name``, loading it on first use."""
+    with _lock:
+        prompt = _prompts.get(name)
+        if prompt is None:
+            prompt = _prompts[name] = _load(name)
+    if REFRESH_INTERVAL > 0:
+        _start_refresher()
+    return prompt
+
+
+def refresh():
+    """Re-pull the loaded prompts that came from the Hub; keep the current text on failure."""
+    from langchain import hub
+
+    for name, source in HUB_SOURCES.items():
+        with _lock:
+            current = _prompts.get(name)
+        if current is None:
+            continue
+        try:
+            pulled = hub.pull(source)
+        except Exception as e:
+            logger.warning(f"Refreshing prompt {name} from {source} failed: {e}")
+            continue
+        if getattr(pulled, "template", None) != current.template.template:
+            with _lock:
+                _prompts[name] = Prompt(name, "hub", pulled)
+            logger.info(f"Prompt {name} updated from {source}")
+
+
+def _start_refresher():
+    global _refresher
+    with _lock:
+        if _refresher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(REFRESH_INTERVAL)
+                refresh()
+
+        _refresher = threading.Thread(target=run, name="prompt-refresh", daemon=True)
+        _refresher.start()
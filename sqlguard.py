@@ -0,0 +1,160 @@
+"""Execution guard for model-written SQL: plan cost check, statement timeout."""
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Seconds a single statement may run before it is interrupted
+STATEMENT_TIMEOUT = float(os.environ.get("SM_SQL_TIMEOUT", 15))
+# Most rows read from any one result
+MAX_ROWS = 100_000
+# SQLite: estimated rows visited (nested loops multiplied out) above which a query is refused
+MAX_SQLITE_ROWS_VISITED = 5_000_000
+# PostgreSQL / MySQL: optimizer cost above which a query is refused
+MAX_PLAN_COST = 1_000_000
+# SQLite plan estimates for tables of unknown size, index lookups and index range scans
+UNKNOWN_TABLE_ROWS = 1000
+INDEX_SEARCH_ROWS = 10
+INDEX_RANGE_FRACTION = 0.25
+# VM instructions between SQLite progress-handler calls
+SQLITE_PROGRESS_STEPS = 10_000
+
+_KEYWORDS = "ON|WHERE|JOIN|LEFT|RIGHT|FULL|INNER|OUTER|CROSS|NATURAL|USING|GROUP|ORDER|LIMIT|UNION|FROM|HAVING"
+# "FROM/JOIN/, table [AS] alias"; the alias is never a keyword, so it cannot swallow the next clause
+_ALIAS = re.compile(
+    rf'(?:\bFROM|\bJOIN|,)\s+[`"\[]?([\w.]+)[`"\]]?(?:\s+(?:AS\s+)?(?!(?:{_KEYWORDS})\b)[`"\[]?(\w+)[`"\]]?)?',
+    re.IGNORECASE,
+)
+_PLAN_STEP = re.compile(r"^(SCAN|SEARCH) (\S+)")
+
+
+class QueryRejected(Exception):
+    """The query was refused or stopped; the message tells the agent what to change."""
+
+
+def _aliases(sql: str) -> dict:
+    aliases = {}
+    for table, alias in _ALIAS.findall(sql):
+        table = table.split(".")[-1]
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def _sqlite_rows_visited(plan, sql: str, row_counts: dict) -> float:
+    """Estimate rows visited from ``EXPLAIN QUERY PLAN`` output.
+
+    Loops at the same level are nested, so their row estimates multiply;
+    a full ``SCAN`` visits the whole table, an index range a fraction of
+    it and any other ``SEARCH`` a few rows.
+    Correlated subqueries run once per outer row, others once.
+    """
+    aliases = _aliases(sql)
+    children = defaultdict(list)
+    for node_id, parent, _, detail in plan:
+        children[parent].append((node_id, detail))
+
+    def visit(parent) -> float:
+        loops, extra = 1.0, 0.0
+        for node_id, detail in children[parent]:
+            step = _PLAN_STEP.match(detail)
+            if step:
+                name = aliases.get(step.group(2), step.group(2))
+                rows = row_counts.get(name) or UNKNOWN_TABLE_ROWS
+                if step.group(1) == "SEARCH":
+                    if ">" in detail or "<" in detail:
+                        rows *= INDEX_RANGE_FRACTION
+                    elif "PRIMARY KEY" in detail or "rowid=" in detail:
+                        rows = 1
+                    else:
+                        rows = INDEX_SEARCH_ROWS
+                loops *= max(rows, 1)
+                extra += visit(node_id)
+            elif "CORRELATED" in detail:
+                extra += loops * visit(node_id)
+            else:
+                extra += visit(node_id)
+        return (loops if loops > 1 or children[parent] else 0) + extra
+
+    return visit(0)
+
+
+def estimate_cost(conn, sql: str, row_counts: dict | None = None):
+    """Return ``(cost, limit, unit)`` for ``sql`` from the dialect's ``EXPLAIN``, or ``None``."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        plan = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        return _sqlite_rows_visited(plan, sql, row_counts or {}), MAX_SQLITE_ROWS_VISITED, "rows visited"
+    if dialect == "postgresql":
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        return float(plan[0]["Plan"]["Total Cost"]), MAX_PLAN_COST, "cost units"
+    if dialect in ("mysql", "mariadb"):
+        plan = json.loads(conn.execute(text(f"EXPLAIN FORMAT=JSON {sql}")).scalar())
+        return float(plan["query_block"]["cost_info"]["query_cost"]), MAX_PLAN_COST, "cost units"
+    return None
+
+
+def check(conn, sql: str, row_counts: dict | None = None):
+    """Raise ``QueryRejected`` if the plan for ``sql`` is estimated to be too expensive.
+
+    A failing ``EXPLAIN`` is ignored here; running the query will report
+    the same error to the agent.
+    """
+    try:
+        estimate = estimate_cost(conn, sql, row_counts)
+    except Exception:
+        conn.rollback()
+        return
+    if estimate is not None and estimate[0] > estimate[1]:
+        cost, limit, unit = estimate
+        raise QueryRejected(
+            f"Query rejected before running: its plan is estimated at {cost:,.0f} {unit} "
+            f"(limit {limit:,}). Join on key columns, add selective WHERE conditions, "
+            f"or aggregate in SQL instead of reading whole tables."
+        )
+
+
+@contextmanager
+def statement_timeout(conn, seconds: float | None = STATEMENT_TIMEOUT):
+    """Interrupt statements on ``conn`` that run longer than ``seconds``.
+
+    SQLite gets a progress handler that aborts past the deadline;
+    PostgreSQL and MySQL get their server-side statement timeout. The
+    interruption surfaces as ``QueryRejected``.
+    """
+    if not seconds:
+        yield
+        return
+    dialect = conn.dialect.name
+    raw = conn.connection.dbapi_connection
+    if dialect == "sqlite":
+        deadline = time.monotonic() + seconds
+        raw.set_progress_handler(lambda: int(time.monotonic() > deadline), SQLITE_PROGRESS_STEPS)
+    elif dialect == "postgresql":
+        conn.execute(text(f"SET LOCAL statement_timeout = {int(seconds * 1000)}"))
+    elif dialect in ("mysql", "mariadb"):
+        previous = conn.execute(text("SELECT @@SESSION.max_execution_time")).scalar()
+        conn.execute(text(f"SET SESSION max_execution_time = {int(seconds * 1000)}"))
+    try:
+        yield
+    except (OperationalError, sqlite3.OperationalError) as e:
+        if "interrupt" in str(e).lower() or "timeout" in str(e).lower() or "maximum statement execution time" in str(e).lower():
+            raise QueryRejected(
+                f"Query stopped after {seconds:g}s. Make it cheaper: join on key columns, "
+                f"filter earlier, or aggregate instead of reading whole tables."
+            ) from e
+        raise
+    finally:
+        if dialect == "sqlite":
+            raw.set_progress_handler(None, 0)
+        elif dialect in ("mysql", "mariadb"):
+            # the session goes back to the pool with its own setting
+            conn.execute(text(f"SET SESSION max_execution_time = {int(previous or 0)}"))
@@ -1,14 +1,12 @@
 import os
-import openai
 import streamlit as st
-from datetime import datetime
 from streamlit.logger import get_logger
-from langchain_openai import ChatOpenAI
-from langchain_community.chat_models import ChatOllama
-from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
 
 logger = get_logger('Langchain-Chatbot')
 
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+LLM_CACHE_ENABLED = os.environ.get("SM_LLM_CACHE", "1") != "0"
+
 # define default session state values
 defaults = {
     "messages": [{"role": "assistant", "content": "How can I help you?"}],
@@ -27,6 +25,7 @@ def enable_chat_history(func):
                 st.cache_resource.clear()
                 del st.session_state["current_page"]
                 del st.session_state["messages"]
+                st.session_state.pop("memories", None)
             except Exception:
                 pass
 
@@ -47,6 +46,22 @@ def display_msg(msg, author):
     st.chat_message(author).write(msg)
 
 
+def get_chat_memory(key: str, llm, **kwargs):
+    """Return this session's conversation memory for ``key``, created on first use.
+
+    Chains are rebuilt on every rerun, so the memory lives in the session
+    state instead; see ``chatmemory.RollingSummaryMemory`` for ``kwargs``.
+    """
+    import chatmemory
+
+    memories = st.session_state.setdefault("memories", {})
+    if key not in memories:
+        memories[key] = chatmemory.RollingSummaryMemory(llm=llm, **kwargs)
+    # the model picked in the sidebar can change between reruns
+    memories[key].llm = llm
+    return memories[key]
+
+
 def choose_custom_openai_key():
     openai_api_key = st.sidebar.text_input(
         label="OpenAI API Key",
@@ -59,24 +74,20 @@ def choose_custom_openai_key():
         st.info("Obtain your key from this link: https://platform.openai.com/account/api-keys")
         st.stop()
 
+    import modelcatalog
+
     model = "gpt-4.1-mini"
     try:
-        client = openai.OpenAI(api_key=openai_api_key)
-        available_models = [
-            {"id": i.id, "created": datetime.fromtimestamp(i.created)}
-            for i in client.models.list()
-            if str(i.id).startswith("gpt")
-        ]
-        available_models = sorted(available_models, key=lambda x: x["created"])
-        available_models = [i["id"] for i in available_models]
+        # cached per key for every session; a known key costs no request
+        available_models = modelcatalog.get_models(openai_api_key)
 
         model = st.sidebar.selectbox(
             label="Model",
             options=available_models,
             key="SELECTED_OPENAI_MODEL"
         )
-    except openai.AuthenticationError as e:
-        st.error(e.body["message"])
+    except modelcatalog.InvalidKey as e:
+        st.error(str(e))
         st.stop()
     except Exception as e:
         st.error("Something went wrong. Please try again later.")
@@ -84,20 +95,43 @@ def choose_custom_openai_key():
     return model, openai_api_key
 
 
-def configure_llm(widget_key: str = "SELECTED_LLM"):
+def configure_llm(widget_key: str = "SELECTED_LLM", cache_namespace: str | None = None):
+    """Return the chat model picked in the sidebar.
+
+    Responses are cached per ``cache_namespace`` (defaults to the widget
+    key, i.e. one namespace per page); see ``llmcache``. Calls are matched
+    exactly unless made inside ``llmcache.semantic_question``. Set
+    SM_LLM_CACHE=0 to disable.
+
+    The same settings return the same pooled model instance (``llmpool``),
+    so reruns and requests reuse its connections. Model clients are
+    imported on first use, so pages that never ask for a model do not
+    pay for them at startup.
+    """
     llm_opt = st.sidebar.radio(
         "LLM",
         ["gpt-4.1-mini", "llama3.2:3b", "use your openai api key"],
         key=widget_key,
     )
+    cache = None
+    if LLM_CACHE_ENABLED:
+        import llmcache
+
+        cache = llmcache.get_response_cache(cache_namespace or widget_key, configure_embedding_model())
+
+    # one shared client per provider, model, endpoint and key; see llmpool
+    import llmpool
 
     if llm_opt == "llama3.2:3b":
-        return ChatOllama(model="llama3.2", base_url=st.secrets["OLLAMA_ENDPOINT"])
-    elif llm_opt == "gpt-4.1-mini":
-        return ChatOpenAI(model_name=llm_opt, temperature=0, streaming=True, api_key=st.secrets["OPENAI_API_KEY"])
-    else:
-        model, openai_api_key = choose_custom_openai_key()
-        return ChatOpenAI(model_name=model, temperature=0, streaming=True, api_key=openai_api_key)
+        return llmpool.get_chat_model("ollama", "llama3.2", base_url=st.secrets["OLLAMA_ENDPOINT"], cache=cache)
+    if llm_opt == "gpt-4.1-mini":
+        return llmpool.get_chat_model(
+            "openai", llm_opt, api_key=st.secrets["OPENAI_API_KEY"], cache=cache, temperature=0, streaming=True
+        )
+    model, openai_api_key = choose_custom_openai_key()
+    return llmpool.get_chat_model(
+        "openai", model, api_key=openai_api_key, cache=cache, temperature=0, streaming=True
+    )
 
 
 def print_qa(cls, question, answer):
@@ -106,7 +140,9 @@ def print_qa(cls, question, answer):
 
 @st.cache_resource
 def configure_embedding_model():
-    return FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
+    from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+
+    return FastEmbedEmbeddings(model_name=EMBEDDING_MODEL)
 
 
 def sync_st_session():
@@ -0,0 +1,179 @@
+"""In-memory vector store on a contiguous, pre-normalized NumPy matrix."""
+import numpy as np
+from langchain_core.documents.base import Document
+from langchain_core.vectorstores import VectorStore
+
+# Rows scored per block in quantized mode, bounding the float32 scratch space
+_BLOCK_ROWS = 8192
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def mmr_select(query_scores: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5):
+    """Maximal marginal relevance over pre-normalized ``candidates``.
+
+    Returns the positions of the chosen rows. Each step scores every
+    remaining candidate at once, so selection costs O(k * n) vector ops
+    instead of a Python loop over pairs.
+    """
+    n = len(candidates)
+    k = min(k, n)
+    if k == 0:
+        return []
+    pairwise = candidates @ candidates.T
+    selected = [int(np.argmax(query_scores))]
+    redundancy = pairwise[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < k:
+        scores = lambda_mult * query_scores - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return selected
+
+
+class NumpyVectorStore(VectorStore):
+    """Cosine-similarity store kept as one row-normalized float32 matrix.
+
+    A search is a single matrix-vector product followed by a partial sort.
+    With ``quantize=True`` rows are stored as int8 with a per-row scale,
+    which takes a quarter of the memory for a small loss of precision.
+    Drop-in for ``DocArrayInMemorySearch`` through ``as_retriever()``,
+    including ``search_type="mmr"``.
+    """
+
+    def __init__(self, embedding, quantize: bool = False):
+        self._embedding = embedding
+        self.quantize = quantize
+        self.docs: list[Document] = []
+        self._matrix = None
+        self._scales = None
+        self._size = 0
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, rows: int, dim: int):
+        capacity = 0 if self._matrix is None else len(self._matrix)
+        if self._size + rows <= capacity:
+            return
+        # grow geometrically so repeated adds stay amortized O(n)
+        new_capacity = max(self._size + rows, 2 * capacity, 1024)
+        matrix = np.empty((new_capacity, dim), dtype=np.int8 if self.quantize else np.float32)
+        scales = np.empty(new_capacity, dtype=np.float32)
+        if self._matrix is not None:
+            matrix[:self._size] = self._matrix[:self._size]
+            scales[:self._size] = self._scales[:self._size]
+        self._matrix, self._scales = matrix, scales
+
+    def add_embeddings(self, docs, vectors) -> list[str]:
+        """Add documents with vectors that were already computed."""
+        if not len(docs):
+            return []
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(docs), -1))
+        self._reserve(len(docs), vectors.shape[1])
+        rows = slice(self._size, self._size + len(docs))
+        if self.quantize:
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._matrix[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+        else:
+            self._matrix[rows] = vectors
+            self._scales[rows] = 1.0
+        ids = [str(i) for i in range(self._size, self._size + len(docs))]
+        self.docs.extend(docs)
+        self._size += len(docs)
+        return ids
+
+    def add_texts(self, texts, metadatas=None, **kwargs) -> list[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        docs = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        return self.add_embeddings(docs, self._embedding.embed_documents(texts))
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, quantize: bool = False, **kwargs):
+        store = cls(embedding, quantize=quantize)
+        store.add_texts(texts, metadatas)
+        return store
+
+    @classmethod
+    def from_embeddings(cls, docs, vectors, embedding, quantize: bool = False):
+        """Build a store from documents and their stored vectors, embedding nothing."""
+        store = cls(embedding, quantize=quantize)
+        store.add_embeddings(docs, vectors)
+        return store
+
+    def _snapshot(self):
+        # size first: rows below it are already written in whichever matrix
+        # is current, so searches can run while add_embeddings() appends
+        size = self._size
+        return size, self._matrix, self._scales
+
+    @staticmethod
+    def _rows(matrix, scales, index) -> np.ndarray:
+        rows = matrix[index]
+        if rows.dtype == np.int8:
+            return rows.astype(np.float32) * scales[index][..., None]
+        return rows
+
+    @staticmethod
+    def _scores(size, matrix, scales, query: np.ndarray) -> np.ndarray:
+        if matrix.dtype != np.int8:
+            return matrix[:size] @ query
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, size)
+            scores[start:stop] = (matrix[start:stop] @ query) * scales[start:stop]
+        return scores
+
+    def _top(self, query, k: int):
+        size, matrix, scales = self._snapshot()
+        k = min(k, size)
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32), np.empty((0, 0), np.float32)
+        scores = self._scores(size, matrix, scales, _normalize(np.asarray(query, dtype=np.float32)))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top], self._rows(matrix, scales, top)
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, **kwargs):
+        top, scores, _ = self._top(embedding, k)
+        return [(self.docs[i], float(score)) for i, score in zip(top, scores)]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, **kwargs):
+        top, scores, rows = self._top(embedding, fetch_k)
+        chosen = mmr_select(scores, rows, k, lambda_mult)
+        return [self.docs[top[i]] for i in chosen]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5, **kwargs):
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult
+        )
+
+    def _select_relevance_score_fn(self):
+        # cosine similarity in [-1, 1] -> relevance in [0, 1]
+        return lambda score: (score + 1.0) / 2.0
@@ -0,0 +1,259 @@
+"""Live web search, result enrichment and HTML-to-text extraction."""
+import hashlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import requests
+import streamlit as st
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from langchain_core.documents.base import Document
+
+from utils import logger
+
+try:
+    from googlesearch import search
+except ImportError:
+    st.error("Install googlesearch-python: pip install googlesearch-python")
+    raise
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+MAX_WORKERS = 8
+# (connect, read) timeout for a single page
+FETCH_TIMEOUT = (3.05, 5)
+# wall-clock budget for enriching all results of one search
+SEARCH_DEADLINE = 6.0
+# title and meta description live in <head>; no need to download whole pages
+MAX_PAGE_BYTES = 256 * 1024
+# most bytes taken per socket read, so the deadline is checked between reads
+READ_CHUNK_BYTES = 16 * 1024
+
+# Elements that never hold page content
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer", "aside", "form"]
+# Elements whose text is kept as one block
+BLOCK_TAGS = ["p", "li", "pre", "blockquote", "td", "th", "dd", "dt", "figcaption",
+              "h1", "h2", "h3", "h4", "h5", "h6"]
+
+_session = None
+
+
+@dataclass
+class ExtractionStats:
+    pages: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    duplicate_blocks: int = 0
+    chunks_out: int = 0
+
+
+@dataclass
+class SearchStats:
+    results: int = 0
+    enriched: int = 0
+    timed_out: int = 0
+    elapsed: float = 0.0
+    fetch_times: dict = field(default_factory=dict)
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide HTTP session so fetches reuse pooled connections."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+def extract_title_snippet(html: str, url: str):
+    """Pull the page title and meta description (or first paragraph) from HTML."""
+    title, snippet = url, ""
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.title and soup.title.string:
+        title = soup.title.string.strip()
+    meta = soup.find("meta", {"name": "description"})
+    if meta and meta.get("content"):
+        snippet = meta["content"].strip()
+    else:
+        p = soup.find("p")
+        if p and p.get_text():
+            snippet = p.get_text().strip().replace("\n", " ")
+    return title, snippet
+
+
+def _fetch(url: str, deadline: float):
+    """Fetch ``url`` and extract its title and snippet, giving up at ``deadline`` (``time.monotonic()``).
+
+    Every socket wait is capped by the time left, so a fetch that missed
+    its search's deadline does not keep running long after it.
+    """
+    start = time.perf_counter()
+    try:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(url)
+        timeout = tuple(min(t, remaining) for t in FETCH_TIMEOUT)
+        with get_session().get(url, timeout=timeout, stream=True) as resp:
+            # read1 returns what one socket read gives; read() waits for the full amount
+            read = getattr(resp.raw, "read1", resp.raw.read)
+            body = bytearray()
+            while len(body) < MAX_PAGE_BYTES and time.monotonic() < deadline:
+                chunk = read(min(READ_CHUNK_BYTES, MAX_PAGE_BYTES - len(body)), decode_content=True)
+                if not chunk:
+                    break
+                body += chunk
+            html = body.decode(resp.encoding or "utf-8", errors="replace")
+        title, snippet = extract_title_snippet(html, url)
+    except Exception:
+        title, snippet = url, ""
+    return title, snippet, time.perf_counter() - start
+
+
+def enrich(urls, deadline: float = SEARCH_DEADLINE):
+    """Fetch every URL concurrently and return ``(entries, stats)``.
+
+    Pages that have not answered when ``deadline`` seconds have passed are
+    listed by URL only, so one slow site cannot hold up the whole search.
+    Each search gets its own worker pool, so fetches still winding down
+    from an earlier search never take workers from this one.
+    """
+    start = time.perf_counter()
+    urls = list(urls)
+    ends_at = time.monotonic() + deadline
+    executor = ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(urls)) or 1, thread_name_prefix="websearch")
+    try:
+        futures = [executor.submit(_fetch, url, ends_at) for url in urls]
+        wait(futures, timeout=deadline)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    stats = SearchStats(results=len(urls))
+    entries = []
+    for url, future in zip(urls, futures):
+        title, snippet = url, ""
+        if future.done() and not future.cancelled():
+            title, snippet, stats.fetch_times[url] = future.result()
+            stats.enriched += 1
+        else:
+            stats.timed_out += 1
+        if snippet:
+            entries.append(f"**{title}**  \n{snippet}  \n<{url}>")
+        else:
+            entries.append(f"**{title}**  \n<{url}>")
+    stats.elapsed = time.perf_counter() - start
+    return entries, stats
+
+
+def safe_free_search(query: str, max_results: int = 5) -> str:
+    """
+    1. Try googlesearch-python signature: search(query, num_results=…)
+    2. Fallback to original googlesearch signature: search(query, stop=…)
+    3. Scrape each URL for title + snippet and return markdown.
+    """
+    try:
+        urls = search(query, num_results=max_results)
+    except TypeError:
+        urls = search(query, stop=max_results, pause=1.0)
+
+    entries, stats = enrich(urls)
+    logger.info(
+        "WebSearch %r: %d results, %d enriched, %d timed out in %.2fs; per fetch: %s",
+        query, stats.results, stats.enriched, stats.timed_out, stats.elapsed,
+        {url: round(t, 3) for url, t in stats.fetch_times.items()},
+    )
+    if not entries:
+        return f"ℹ️ No results found for '{query}'."
+    return "\n\n".join(entries)
+
+
+def extract_blocks(html: str):
+    """Yield the whitespace-normalized text blocks of a page's main content.
+
+    Scripts, styles and navigation chrome are dropped, and ``<main>`` or
+    ``<article>`` is preferred over the whole body when present.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    root = soup.find("main") or soup.find("article") or soup.body or soup
+    found = False
+    for el in root.find_all(BLOCK_TAGS):
+        # innermost blocks only, so a <li><p>…</p></li> is not kept twice
+        if el.find(BLOCK_TAGS) is not None:
+            continue
+        text = re.sub(r"\s+", " ", el.get_text(" ", strip=True))
+        if text:
+            found = True
+            yield text
+    if not found:
+        # div-only layouts: fall back to the text lines of the content root
+        for line in root.get_text("\n", strip=True).splitlines():
+            text = re.sub(r"\s+", " ", line).strip()
+            if text:
+                yield text
+
+
+def block_key(block: str) -> str:
+    """Case-insensitive hash that identifies a text block across pages."""
+    return hashlib.sha1(block.lower().encode()).hexdigest()
+
+
+def dedupe_blocks(pages, seen: set | None = None, stats: ExtractionStats | None = None):
+    """Drop blocks already kept by an earlier page from ``(url, blocks)`` pairs, lazily.
+
+    Yields ``(url, kept, dropped)``: the page's blocks in order without
+    repeats, and the keys of the blocks left out because another page
+    has them. The keys of kept blocks are added to ``seen``, so passing
+    the keys kept by pages indexed earlier dedupes against those too.
+    """
+    stats = stats if stats is not None else ExtractionStats()
+    seen = seen if seen is not None else set()
+    for url, blocks in pages:
+        kept, own, dropped = [], set(), set()
+        for block in blocks:
+            key = block_key(block)
+            if key in seen:
+                stats.duplicate_blocks += 1
+                if key not in own:
+                    dropped.add(key)
+                continue
+            seen.add(key)
+            own.add(key)
+            kept.append(block)
+        yield url, kept, dropped
+
+
+def page_document(url: str, blocks, stats: ExtractionStats | None = None):
+    """Join a page's blocks into one text ``Document``, or ``None`` if it has none."""
+    if not blocks:
+        return None
+    text = "\n\n".join(blocks)
+    if stats is not None:
+        stats.bytes_out += len(text.encode())
+    return Document(page_content=text, metadata={"source": url})
+
+
+def html_to_documents(pages, stats: ExtractionStats | None = None):
+    """Turn ``(url, html)`` pairs into one text ``Document`` per page, lazily.
+
+    Blocks already seen on an earlier page (cookie banners, repeated
+    sidebars) are skipped. Pages with no text left produce no document.
+    """
+    stats = stats if stats is not None else ExtractionStats()
+
+    def extracted():
+        for url, html in pages:
+            stats.pages += 1
+            stats.bytes_in += len(html.encode())
+            yield url, extract_blocks(html)
+
+    for url, kept, _ in dedupe_blocks(extracted(), stats=stats):
+        doc = page_document(url, kept, stats)
+        if doc is not None:
+            yield doc